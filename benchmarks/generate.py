@@ -0,0 +1,62 @@
+'''синтетические операции в схеме data/operations.xlsx'''
+import numpy as np
+import pandas as pd
+
+CATEGORIES = [
+    "Супермаркеты", "Фастфуд", "Транспорт", "Переводы", "Ж/д билеты", "Различные товары", "Связь",
+    "Пополнения", "Аптеки", "Каршеринг", "Рестораны", "Бонусы", "Наличные", "Дом и ремонт",
+    "Услуги банка", "Топливо", "Образование", "Одежда и обувь", "Другое", "Сервис", "ЖКХ", "Цветы",
+    "Местный транспорт", "Мобильная связь", "Книги", "Красота", "НКО", "Отели", "Госуслуги",
+    "Развлечения", "Косметика", "Медицина", "Зарплата", "Сувениры", "Кино", "Частные услуги", "Такси",
+    "Детские товары", "Канцтовары", "Авиабилеты", "Электроника и техника", "Спорттовары", "Финансы",
+    "Турагентства", "Фото и видео", "Онлайн-кинотеатры", "Автоуслуги", "Искусство", "Duty Free",
+]
+CURRENCIES = ["RUB", "TRY", "EUR", "CNY", "USD"]
+START = np.datetime64("2018-01-01")
+DAYS = 5 * 365
+
+
+def _format_dates(days: np.ndarray, fmt: str) -> np.ndarray:
+    '''форматирует только уникальные даты и раскладывает строки по индексу'''
+    unique, inverse = np.unique(days, return_inverse=True)
+    strings = pd.DatetimeIndex(START + unique.astype("timedelta64[D]")).strftime(fmt).to_numpy(dtype=object)
+    return strings[inverse]
+
+
+def generate_operations(rows: int, seed: int = 0) -> pd.DataFrame:
+    '''генерирует rows операций: 93% расходов, несколько карт, ~50 категорий, даты за 5 лет'''
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, DAYS, rows)
+    seconds = rng.integers(0, 24 * 3600, rows)
+    operation_time = (
+        START + days.astype("timedelta64[D]") + seconds.astype("timedelta64[s]")
+    )
+    cards = np.array([f"*{number:04d}" for number in rng.integers(1000, 9999, max(8, rows // 1000))], dtype=object)
+    card = cards[rng.integers(0, len(cards), rows)]
+    card[rng.random(rows) < 0.1] = np.nan
+
+    amount = np.round(rng.lognormal(5, 1.2, rows), 2)
+    amount[rng.random(rows) < 0.93] *= -1
+    category = np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)]
+    category[rng.random(rows) < 0.006] = np.nan
+    descriptions = np.array([f"Магазин {i}" for i in range(max(700, rows // 100))], dtype=object)
+    currency = np.array(CURRENCIES, dtype=object)[(rng.random(rows) < 0.02) * rng.integers(1, 5, rows)]
+    cashback = np.where(rng.random(rows) < 0.05, np.round(amount / 100), np.nan)
+
+    return pd.DataFrame({
+        "Дата операции": pd.DatetimeIndex(operation_time).strftime("%d.%m.%Y %H:%M:%S").to_numpy(dtype=object),
+        "Дата платежа": _format_dates(days + (rng.random(rows) < 0.3), "%d.%m.%Y"),
+        "Номер карты": card,
+        "Статус": np.where(rng.random(rows) < 0.006, "FAILED", "OK").astype(object),
+        "Сумма операции": amount,
+        "Валюта операции": currency,
+        "Сумма платежа": amount,
+        "Валюта платежа": "RUB",
+        "Кэшбэк": cashback,
+        "Категория": category,
+        "MCC": rng.integers(4000, 8000, rows).astype(float),
+        "Описание": descriptions[rng.integers(0, len(descriptions), rows)],
+        "Бонусы (включая кэшбэк)": np.maximum(0, -amount // 50).astype(np.int64),
+        "Округление на инвесткопилку": 0,
+        "Сумма операции с округлением": np.abs(amount),
+    })
@@ -0,0 +1,187 @@
+'''
+замеры views, reports, services и utils на синтетических данных
+
+    python benchmarks/run.py --rows 10000
+    python benchmarks/run.py --rows 1000000 --save-baseline
+
+для каждой функции пишется лучшее время первого вызова на свежем фрейме (cold),
+лучшее время повторных вызовов (warm) и пик памяти; замеряется компактная схема
+(schema.compact_operations), как у loader.dataset; при сравнении с baseline.json
+замедление больше чем в tolerance раз или отсутствие baseline для --rows
+завершает запуск с кодом 1
+'''
+import argparse
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import views  # noqa: E402
+from generate import CATEGORIES, generate_operations  # noqa: E402
+from loader import dataset  # noqa: E402
+from quotes import QuoteFetcher  # noqa: E402
+from reports import spending_by_categories, spending_by_category  # noqa: E402
+from schema import compact_operations  # noqa: E402
+from services import analize_category  # noqa: E402
+from utils import all_cards, top_transactions  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+# абсолютный допуск, чтобы не падать на шуме в микросекундных замерах
+NOISE_FLOOR = 0.005
+
+
+class StubQuotes(BaseHTTPRequestHandler):
+    '''локальная замена apilayer и finnhub'''
+
+    def do_GET(self):
+        if self.path.startswith("/latest"):
+            body = {"rates": {"USD": 0.011, "EUR": 0.01}}
+        else:
+            body = {"c": 100.0}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub() -> tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubQuotes)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def entry_points(df) -> dict[str, Callable]:
+    '''
+    функции для замера; отчеты берутся без записи файла и без memoize (__wrapped__.__wrapped__),
+    иначе warm замерял бы копию готового результата, а не расчет
+    '''
+    queries = [(category, (28, month, 2021)) for category in CATEGORIES for month in range(1, 13)]
+    return {
+        "veb_json": lambda frame: views.veb_json(),
+        "all_cards": all_cards,
+        "top_transactions": top_transactions,
+        "analize_category": lambda frame: [
+            analize_category.__wrapped__(frame, 2021, month) for month in range(1, 13)
+        ],
+        "spending_by_category": lambda frame: spending_by_category.__wrapped__.__wrapped__(
+            frame, "Супермаркеты", (31, 12, 2021)
+        ),
+        "spending_by_categories": lambda frame: spending_by_categories.__wrapped__.__wrapped__(frame, queries),
+    }
+
+
+def measure(name: str, func: Callable, df, repeat: int, cold_repeat: int = 3) -> dict:
+    '''
+    cold - лучший из cold_repeat первых вызовов, каждый на новом фрейме (строятся индексы),
+    warm - лучший из repeat повторных вызовов на последнем из них
+    '''
+    cold = float("inf")
+    for _ in range(cold_repeat):
+        frame = df.copy()
+        dataset.set_frame(frame)
+        start = time.perf_counter()
+        func(frame)
+        cold = min(cold, time.perf_counter() - start)
+
+    warm = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(frame)
+        warm = min(warm, time.perf_counter() - start)
+
+    frame = df.copy()
+    dataset.set_frame(frame)
+    tracemalloc.start()
+    func(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cold": cold, "warm": warm, "peak_mb": peak / 2**20}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for metric in ("cold", "warm"):
+            if current[metric] > expected[metric] * tolerance + NOISE_FLOOR:
+                regressions.append(
+                    f"{name}.{metric}: {current[metric]:.4f}s против {expected[metric]:.4f}s в baseline"
+                )
+        if current["peak_mb"] > expected["peak_mb"] * tolerance + 1:
+            regressions.append(
+                f"{name}.peak_mb: {current['peak_mb']:.1f} MB против {expected['peak_mb']:.1f} MB в baseline"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000,
+                        help="размер синтетической выгрузки (10000, 1000000, 10000000)")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторных (warm) вызовов")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="число первых (cold) вызовов на новых фреймах")
+    parser.add_argument("--only", nargs="*", help="замерить только эти функции")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="допустимое замедление относительно baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты в baseline.json")
+    parser.add_argument("--json", type=Path, help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    server, url = start_stub()
+    views.quote_fetcher = QuoteFetcher(rates_url=url, stocks_url=url)
+    # requests импортируется при первом запросе (quotes._requests); здесь замеряется расчет,
+    # а время импорта и первого ответа после старта - в benchmarks/startup.py
+    views.quote_fetcher.session
+
+    start = time.perf_counter()
+    # замеряется та же схема, что у loader.dataset (compact=True)
+    df = compact_operations(generate_operations(args.rows))
+    print(f"сгенерировано {len(df)} строк за {time.perf_counter() - start:.2f}s")
+
+    results = {}
+    for name, func in entry_points(df).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(name, func, df, args.repeat, args.cold_repeat)
+        item = results[name]
+        print(f"{name:24} cold {item['cold']:9.4f}s  warm {item['warm']:9.4f}s  peak {item['peak_mb']:9.1f} MB")
+    server.shutdown()
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    baselines = json.loads(BASELINE_PATH.read_text(encoding="utf-8")) if BASELINE_PATH.exists() else {}
+    if args.save_baseline:
+        baselines[str(args.rows)] = {"date": datetime.now().strftime("%Y-%m-%d"), "results": results}
+        BASELINE_PATH.write_text(json.dumps(baselines, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"baseline для {args.rows} строк сохранен в {BASELINE_PATH}")
+        return 0
+
+    baseline = baselines.get(str(args.rows))
+    if baseline is None:
+        sizes = ", ".join(sorted(baselines, key=int)) or "нет"
+        print(f"нет baseline для {args.rows} строк (есть: {sizes}), запишите его через --save-baseline")
+        return 1
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for line in regressions:
+        print(f"РЕГРЕССИЯ {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+'''
+холодный старт views: время импорта модулей, шагов ввода-вывода и первого ответа
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --top 15 --parse-xlsx
+
+каждый замер идет в новом процессе интерпретатора: время импорта по модулям
+берется из python -X importtime, шаги (настройки, выгрузка операций, папка логов,
+первый veb_json) замеряются через metrics.stage; котировки отдает локальная заглушка
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+STEPS = ("settings", "workbook", "workbook.xlsx", "log_dir", "first_response")
+
+
+def _env() -> dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_times(module: str = "views", cwd: str | Path = SRC) -> dict[str, tuple[int, int]]:
+    '''
+    {модуль: (собственное время, время с вложенными импортами)} в микросекундах;
+    модули, которые интерпретатор загружает и без import module (site и .pth), не попадают
+    '''
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=_env(), capture_output=True, text=True, check=True,
+    )
+    bare = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"], cwd=cwd, env=_env(), capture_output=True, text=True
+    )
+    preloaded = {line.rsplit("|", 1)[-1].strip() for line in bare.stderr.splitlines()}
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() not in preloaded:
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def top_level(times: dict[str, tuple[int, int]], module: str = "views") -> dict[str, int]:
+    '''время с вложенными импортами для пакетов верхнего уровня (pandas, loader, ...), кроме самого module'''
+    return {name: cumulative for name, (_, cumulative) in times.items() if "." not in name and name != module}
+
+
+def _child(stub_url: str, parse_xlsx: bool) -> None:
+    '''замеры внутри нового процесса, результат - json в stdout'''
+    start = time.perf_counter()
+    import views
+    import_seconds = time.perf_counter() - start
+    modules_after_import = sorted(name for name in ("requests", "openpyxl", "finnhub") if name in sys.modules)
+
+    from loader import OPERATIONS_PATH, read_excel_file
+    from metrics import metrics
+    from quotes import QuoteFetcher
+    from reports import get_logger
+    from utils import user_settings
+
+    # без истории котировок: на старте всегда идет запрос, как у первого запуска
+    views.quote_fetcher = QuoteFetcher(rates_url=stub_url, stocks_url=stub_url)
+    with metrics.stage("settings"):
+        user_settings()
+    with metrics.stage("workbook"):
+        views.dataset.load()
+    if parse_xlsx:
+        with metrics.stage("workbook.xlsx"):
+            read_excel_file(OPERATIONS_PATH, use_cache=False)
+    with metrics.stage("log_dir"):
+        get_logger()
+    with metrics.stage("first_response"):
+        views.veb_json()
+    views.quote_fetcher.close()
+
+    snapshot = metrics.snapshot()
+    steps = {name: snapshot[name]["seconds"] for name in STEPS if name in snapshot}
+    print(json.dumps({
+        "import": import_seconds,
+        "steps": steps,
+        "total": time.perf_counter() - start,
+        "modules_after_import": modules_after_import,
+    }))
+
+
+def cold_start(stub_url: str, parse_xlsx: bool = False) -> dict:
+    '''один холодный старт в новом процессе; папка логов создается во временном каталоге'''
+    command = [sys.executable, str(Path(__file__).resolve()), "--child", stub_url]
+    if parse_xlsx:
+        command.append("--parse-xlsx")
+    with tempfile.TemporaryDirectory() as cwd:
+        completed = subprocess.run(command, cwd=cwd, env=_env(), capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="число холодных стартов, берется лучший")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых долгих импортов показать")
+    parser.add_argument("--parse-xlsx", action="store_true", help="отдельно замерить разбор xlsx без кэша")
+    parser.add_argument("--json", type=Path, help="сохранить результаты в файл")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.parse_xlsx)
+        return 0
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from run import start_stub
+
+    times = import_times()
+    packages = sorted(top_level(times).items(), key=lambda item: item[1], reverse=True)
+    print(f"импорт views: {times['views'][1] / 1e6:.3f}s")
+    for name, cumulative in packages[:args.top]:
+        print(f"  {name:24} {cumulative / 1e6:9.4f}s")
+
+    server, url = start_stub()
+    runs = [cold_start(url, args.parse_xlsx) for _ in range(args.runs)]
+    server.shutdown()
+    best = min(runs, key=lambda run: run["total"])
+    print(f"\nхолодный старт (лучший из {args.runs}): {best['total']:.3f}s")
+    print(f"  {'import views':24} {best['import']:9.4f}s")
+    for name, seconds in best["steps"].items():
+        print(f"  {name:24} {seconds:9.4f}s")
+    print(f"  загружены при импорте: {', '.join(best['modules_after_import']) or 'нет тяжелых зависимостей'}")
+
+    if args.json:
+        result = {"imports": dict(packages), "cold_start": best}
+        args.json.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from loader import cached_text_column, load_columns, read_cached_rows, read_operations, write_cache
+from reports import frame_total, spending_by_categories
+from schema import payment_dates
+from services import CategoryIndex
+from utils import all_cards
+
+EXPORT_PATTERNS = ("*.xlsx", "*.csv")
+
+
+def find_exports(directory: str | Path) -> list[Path]:
+    '''выгрузки операций в папке: xlsx и csv'''
+    directory = Path(directory)
+    return sorted(path for pattern in EXPORT_PATTERNS for path in directory.glob(pattern))
+
+
+def analyze_operations(df: pd.DataFrame) -> dict:
+    '''
+    аналитика по одной выгрузке: карты, траты по категориям за каждый месяц
+    и траты по категориям за 90 дней до последнего платежа
+
+    фрейм воркера не принадлежит Dataset, кэши по фрейму на него не действуют,
+    поэтому индекс по месяцам строится здесь один раз на всю выгрузку
+    '''
+    dates = payment_dates(df["Дата платежа"]).dropna()
+    months = sorted(set(zip(dates.dt.year.tolist(), dates.dt.month.tolist())))
+    index = CategoryIndex(df)
+    result: dict = {
+        "rows": len(df),
+        "cards": all_cards(df),
+        "categories_by_month": {
+            f"{year}-{month:02d}": index.month(year, month) for year, month in months
+        },
+        "spending_90_days": [],
+    }
+    if not dates.empty:
+        last = dates.max()
+        categories = sorted(df["Категория"].dropna().unique())
+        queries = [(category, (last.day, last.month, last.year)) for category in categories]
+        frames = spending_by_categories.__wrapped__(df, queries)
+        result["spending_90_days"] = [
+            {"category": category, "total_sum": frame_total(frame), "operations": len(frame)}
+            for category, frame in zip(categories, frames)
+        ]
+    return result
+
+
+def process_export(source: str, out_dir: str) -> dict:
+    '''
+    задача воркера: читает выгрузку и пишет свой отчет
+
+    воркер получает только пути, дата-фреймы не передаются через pickle;
+    у каждой задачи свой файл, и он целиком читается в память своего процесса -
+    общих данных между задачами здесь нет (для одной общей выгрузки - run_shared)
+    '''
+    start = time.perf_counter()
+    df = read_operations(source)
+    report = analyze_operations(df)
+    out_path = Path(out_dir) / f"{Path(source).stem}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, separators=(",", ":"))
+    return {"source": source, "report": str(out_path), "rows": len(df), "seconds": time.perf_counter() - start}
+
+
+def run_batch(directory: str | Path, out_dir: str | Path, workers: int | None = None) -> list[dict]:
+    '''
+    считает аналитику по всем выгрузкам папки в пуле процессов,
+    каждая выгрузка - отдельная задача со своим отчетом в out_dir
+    '''
+    exports = find_exports(directory)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(exports) <= 1:
+        return [process_export(str(source), str(out_dir)) for source in exports]
+    with ProcessPoolExecutor(max_workers=min(workers, len(exports))) as pool:
+        futures = [pool.submit(process_export, str(source), str(out_dir)) for source in exports]
+        return [future.result() for future in futures]
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^\w-]+", "_", str(value)).strip("_") or "empty"
+
+
+def process_group(source: str, by: str, code: int, out_dir: str) -> dict:
+    '''
+    задача воркера для общей выгрузки: отчет по строкам, где в колонке by значение с кодом code
+
+    колонки берутся из колоночного кэша выгрузки через mmap (read-only, страницы общие
+    для всех процессов), в память воркера копируются только строки его группы
+    '''
+    start = time.perf_counter()
+    codes, values = cached_text_column(source, by)
+    df = read_cached_rows(source, np.flatnonzero(codes == code))
+    report = analyze_operations(df)
+    out_path = Path(out_dir) / f"{Path(source).stem}_{_slug(values[code])}.json"
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, separators=(",", ":"))
+    return {"source": f"{source} [{by}={values[code]}]", "report": str(out_path), "rows": len(df),
+            "seconds": time.perf_counter() - start}
+
+
+def run_shared(
+    source: str | Path, out_dir: str | Path, by: str = "Номер карты", workers: int | None = None
+) -> list[dict]:
+    '''
+    считает аналитику по одной выгрузке многих клиентов: задача на каждое значение колонки by
+
+    процесс-родитель только проверяет (при необходимости строит) колоночный кэш,
+    воркеры получают путь и код группы и читают общий кэш через mmap
+    '''
+    source = str(source)
+    if load_columns(source) is None:
+        write_cache(read_operations(source), source)
+    column = cached_text_column(source, by)
+    if column is None:
+        raise ValueError(f"колонка {by} не найдена среди текстовых колонок выгрузки")
+    codes = np.unique(column[0])
+    codes = codes[codes >= 0].tolist()
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(codes) <= 1:
+        return [process_group(source, by, code, str(out_dir)) for code in codes]
+    with ProcessPoolExecutor(max_workers=min(workers, len(codes))) as pool:
+        futures = [pool.submit(process_group, source, by, code, str(out_dir)) for code in codes]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="аналитика по папке выгрузок операций в несколько процессов")
+    parser.add_argument("directory", help="папка с выгрузками (.xlsx, .csv) или одна общая выгрузка")
+    parser.add_argument("--out", default="reports/batch", help="папка для отчетов")
+    parser.add_argument("--workers", type=int, help="число процессов, по умолчанию - число ядер")
+    parser.add_argument("--by", default="Номер карты", help="для общей выгрузки: колонка, по которой делятся задачи")
+    args = parser.parse_args()
+    if Path(args.directory).is_file():
+        items = run_shared(args.directory, args.out, args.by, args.workers)
+    else:
+        items = run_batch(args.directory, args.out, args.workers)
+    for item in items:
+        print(f"📄 {item['source']}: {item['rows']} строк за {item['seconds']:.2f}s -> {item['report']}")
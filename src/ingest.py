@@ -0,0 +1,123 @@
+'''
+потоковое чтение выгрузок, которые не помещаются в память
+
+    python src/ingest.py data/operations.xlsx --chunk-size 50000
+
+файл читается пачками по chunk_size строк (xlsx - openpyxl в режиме read_only, csv - read_csv
+с chunksize), каждая пачка приводится к компактной схеме и сразу уходит в агрегаты
+all_cards, analize_category и top_transactions; в памяти одновременно только одна пачка
+'''
+import argparse
+import json
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from metrics import metrics
+from schema import compact_operations
+from services import CategoryIndex
+from utils import CardSummary, RunningTop
+
+CHUNK_ROWS = 50_000
+
+
+def _xlsx_chunks(source: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [name for name in header if name is not None]
+        width = len(columns)
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row[:width])
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=columns).infer_objects()
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns).infer_objects()
+    finally:
+        workbook.close()
+
+
+def iter_operation_chunks(
+    source: str | Path, chunk_size: int = CHUNK_ROWS, compact: bool = True
+) -> Iterator[pd.DataFrame]:
+    '''
+    выгрузка операций пачками по chunk_size строк
+
+    индексы пачек продолжают друг друга, как у строк целого файла;
+    compact - каждая пачка в компактной схеме (schema.compact_operations)
+    '''
+    source = Path(source)
+    if source.suffix.lower() == ".csv":
+        chunks = pd.read_csv(source, chunksize=chunk_size)
+    else:
+        chunks = _xlsx_chunks(source, chunk_size)
+    offset = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield compact_operations(chunk) if compact else chunk
+
+
+class StreamingAggregates:
+    '''
+    агрегаты all_cards, analize_category и top_transactions, которые копятся по пачкам
+
+    результат совпадает с вызовом функций на всем файле сразу
+    '''
+
+    def __init__(self, n: int = 5, cashback_percent: dict[str, float] | None = None):
+        self.rows = 0
+        self.cards = CardSummary(cashback_percent=cashback_percent)
+        self.categories = CategoryIndex()
+        self.top = RunningTop(n)
+
+    def append(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        self.cards.append(chunk)
+        self.categories.append(chunk)
+        self.top.append(chunk)
+
+    def all_cards(self) -> list[dict]:
+        return self.cards.records()
+
+    def analize_category(self, year: int, month: int) -> dict[str, int]:
+        return self.categories.month(year, month)
+
+    def top_transactions(self) -> list[dict]:
+        return self.top.top()
+
+
+def ingest(
+    source: str | Path,
+    chunk_size: int = CHUNK_ROWS,
+    n: int = 5,
+    cashback_percent: dict[str, float] | None = None,
+) -> StreamingAggregates:
+    '''читает выгрузку пачками и возвращает накопленные агрегаты, сами строки не сохраняются'''
+    aggregates = StreamingAggregates(n, cashback_percent)
+    for chunk in iter_operation_chunks(source, chunk_size):
+        with metrics.stage("ingest.chunk", rows=len(chunk)):
+            aggregates.append(chunk)
+    return aggregates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="агрегаты по большой выгрузке без загрузки ее целиком")
+    parser.add_argument("source", help="выгрузка операций (.xlsx или .csv)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_ROWS, help="строк в одной пачке")
+    args = parser.parse_args()
+    result = ingest(args.source, args.chunk_size)
+    print(json.dumps({
+        "rows": result.rows,
+        "cards": result.all_cards(),
+        "top_transactions": result.top_transactions(),
+    }, ensure_ascii=False, indent=4))
@@ -0,0 +1,422 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import weakref
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from schema import align_categories, compact_operations
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+CACHE_DIR_NAME = ".cache"
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+OPERATIONS_PATH = DATA_DIR / "operations.xlsx"
+SETTINGS_PATH = DATA_DIR / "user_settings.json"
+
+
+def file_sha256(path: str | Path) -> str:
+    '''считает sha256 файла по кускам, не читая его целиком в память'''
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir_for(source: str | Path) -> Path:
+    '''папка колоночного кэша для excel файла: data/.cache/<имя файла>/'''
+    source = Path(source)
+    return source.parent / CACHE_DIR_NAME / source.stem
+
+
+def _read_meta(cache_dir: Path) -> dict | None:
+    try:
+        with open(cache_dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != CACHE_FORMAT:
+        return None
+    return meta
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def _cache_is_fresh(meta: dict, source: Path) -> bool:
+    '''
+    сверяет кэш с исходным файлом: сначала по mtime и размеру,
+    а если они изменились (файл скопировали или тронули) - по sha256
+    '''
+    stat = source.stat()
+    if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+        return True
+    if meta["size"] != stat.st_size or meta["sha256"] != file_sha256(source):
+        return False
+    meta["mtime_ns"] = stat.st_mtime_ns
+    try:
+        _write_json_atomic(cache_dir_for(source) / "meta.json", meta)
+    except OSError:
+        pass
+    return True
+
+
+def write_cache(df: pd.DataFrame, source: str | Path) -> Path:
+    '''
+    сохраняет дата-фрейм в колоночный кэш рядом с исходным файлом
+
+    числовые колонки и даты пишутся как .npy,
+    текстовые - как коды int32 (.npy) плюс список уникальных значений в meta.json
+    '''
+    source = Path(source)
+    cache_dir = cache_dir_for(source)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stat = source.stat()
+    sha256 = file_sha256(source)
+    prefix = sha256[:16]
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        file_name = f"{prefix}_{i:03d}.npy"
+        if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            np.save(cache_dir / file_name, codes.astype(np.int32))
+            columns.append(
+                {"name": name, "kind": "text", "file": file_name, "values": list(uniques)}
+            )
+        else:
+            np.save(cache_dir / file_name, series.to_numpy())
+            columns.append({"name": name, "kind": "array", "file": file_name})
+
+    meta = {
+        "format": CACHE_FORMAT,
+        "source": source.name,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+        "rows": len(df),
+        "columns": columns,
+    }
+    _write_json_atomic(cache_dir / "meta.json", meta)
+
+    for old_file in cache_dir.glob("*.npy"):
+        if not old_file.name.startswith(prefix):
+            old_file.unlink(missing_ok=True)
+    return cache_dir
+
+
+def _load_cache(source: Path) -> tuple[dict, dict[str, np.ndarray]] | None:
+    meta = _read_meta(cache_dir_for(source))
+    if meta is None or not _cache_is_fresh(meta, source):
+        return None
+    cache_dir = cache_dir_for(source)
+    try:
+        arrays = {
+            column["name"]: np.load(cache_dir / column["file"], mmap_mode="r")
+            for column in meta["columns"]
+        }
+    except (OSError, ValueError):
+        return None
+    return meta, arrays
+
+
+def load_columns(source: str | Path) -> dict[str, np.ndarray] | None:
+    '''
+    возвращает колонки из кэша в виде массивов numpy, отображенных в память
+
+    текстовые колонки отдаются кодами (int32, -1 для пустых значений),
+    None - если кэша нет или он устарел
+    '''
+    cached = _load_cache(Path(source))
+    return None if cached is None else cached[1]
+
+
+def cached_text_column(source: str | Path, name: str) -> tuple[np.ndarray, list] | None:
+    '''
+    текстовая колонка из кэша: коды (memmap, без копии; -1 - пусто) и список значений;
+    None - если кэша нет, он устарел или колонка не текстовая
+    '''
+    cached = _load_cache(Path(source))
+    if cached is None:
+        return None
+    meta, arrays = cached
+    for column in meta["columns"]:
+        if column["name"] == name and column["kind"] == "text":
+            return arrays[name], column["values"]
+    return None
+
+
+def read_cached_rows(source: str | Path, rows: np.ndarray, categorical: bool = False) -> pd.DataFrame | None:
+    '''
+    только строки rows из колоночного кэша: колонки отображены в память и общие
+    для всех процессов, в память процесса копируются лишь выбранные строки
+    '''
+    return _frame_from_cache(Path(source), categorical, rows)
+
+
+def _frame_from_cache(source: Path, categorical: bool = False, rows: np.ndarray | None = None) -> pd.DataFrame | None:
+    cached = _load_cache(source)
+    if cached is None:
+        return None
+    meta, arrays = cached
+    data = {}
+    for column in meta["columns"]:
+        array = arrays[column["name"]] if rows is None else arrays[column["name"]][rows]
+        if column["kind"] == "text" and categorical:
+            data[column["name"]] = pd.Categorical.from_codes(np.array(array), categories=column["values"])
+        elif column["kind"] == "text":
+            # последний элемент - NaN, на него попадают коды -1
+            values = np.array(column["values"] + [np.nan], dtype=object)
+            data[column["name"]] = values.take(array)
+        else:
+            data[column["name"]] = np.array(array)
+    return pd.DataFrame(data, columns=[column["name"] for column in meta["columns"]])
+
+
+def read_excel_file(road_to_excel_file: str | Path, use_cache: bool = True, categorical: bool = False) -> pd.DataFrame:
+    '''
+    возвращает excel файл в виде дата-фрейма
+
+    при первом чтении файл конвертируется в колоночный кэш,
+    следующие загрузки читают кэш и не разбирают xlsx;
+    categorical: текстовые колонки отдаются как category прямо из кодов кэша
+    '''
+    source = Path(road_to_excel_file)
+    if use_cache:
+        df = _frame_from_cache(source, categorical)
+        if df is not None:
+            return df
+
+    df = pd.read_excel(source)
+    if use_cache:
+        try:
+            write_cache(df, source)
+        except OSError as error:
+            logger.warning("не удалось сохранить кэш для %s: %s", source, error)
+    return df
+
+
+_derived: dict[tuple[int, str], tuple[weakref.ref, int, Any]] = {}
+_owned: dict[int, weakref.ref] = {}
+
+
+def _own(df: pd.DataFrame) -> None:
+    key = id(df)
+    _owned[key] = weakref.ref(df, lambda _: _owned.pop(key, None))
+
+
+def is_owned(df: pd.DataFrame) -> bool:
+    '''
+    фрейм выдан Dataset: операции в нем меняются только через append, set_frame и reload,
+    которые выдают новый фрейм, поэтому производные структуры для него можно хранить
+    '''
+    ref = _owned.get(id(df))
+    return ref is not None and ref() is df
+
+
+def cached_for_frame(df: pd.DataFrame, name: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+    '''
+    строит производную структуру (индекс, агрегаты) для дата-фрейма один раз
+
+    кэшируются только фреймы Dataset (is_owned), результат живет, пока жив сам фрейм;
+    фрейм, переданный вызывающим, могут изменить на месте, для него структура строится заново
+    '''
+    value = peek_for_frame(df, name)
+    if value is not None:
+        return value
+    value = build(df)
+    _remember(df, name, value)
+    return value
+
+
+def peek_for_frame(df: pd.DataFrame, name: str) -> Any | None:
+    '''уже построенная структура для фрейма или None, ничего не строит'''
+    item = _derived.get((id(df), name))
+    if item is not None and item[0]() is df and item[1] == len(df):
+        return item[2]
+    return None
+
+
+def _remember(df: pd.DataFrame, name: str, value: Any) -> None:
+    if not is_owned(df):
+        return
+    key = (id(df), name)
+    _derived[key] = (weakref.ref(df, lambda _: _derived.pop(key, None)), len(df), value)
+
+
+_fingerprints = itertools.count(1)
+
+
+def frame_fingerprint(df: pd.DataFrame) -> int | None:
+    '''
+    номер версии данных фрейма для ключей кэшей результатов
+
+    номер выдается один раз на фрейм и не переносится через carry_over,
+    так что после append и set_frame у операций новый номер;
+    None - фрейм не из Dataset (is_owned), его могут изменить на месте и результаты не кэшируются
+    '''
+    if not is_owned(df):
+        return None
+    return cached_for_frame(df, "fingerprint", lambda _: next(_fingerprints))
+
+
+def carry_over(old: pd.DataFrame, new: pd.DataFrame, delta: pd.DataFrame) -> None:
+    '''
+    переносит производные структуры старого фрейма на новый
+
+    структуры с методом follow(new, delta) переходят на новый фрейм и читают строки из него,
+    с методом append(delta) - дописываются только новыми строками,
+    остальные отбрасываются и при следующем обращении строятся заново
+    '''
+    for key, (ref, _, value) in list(_derived.items()):
+        if key[0] != id(old) or ref() is not old:
+            continue
+        del _derived[key]
+        if hasattr(value, "follow"):
+            value.follow(new, delta)
+            _remember(new, key[1], value)
+        elif hasattr(value, "append"):
+            value.append(delta)
+            _remember(new, key[1], value)
+
+
+def read_operations(source: str | Path, compact: bool = False) -> pd.DataFrame:
+    '''читает выгрузку операций: xlsx через кэш, csv напрямую; compact - в компактной схеме'''
+    source = Path(source)
+    if source.suffix.lower() == ".csv":
+        df = pd.read_csv(source)
+    else:
+        df = read_excel_file(source, categorical=compact)
+    return compact_operations(df) if compact else df
+
+
+KEY_COLUMNS = ["Дата операции", "Номер карты", "Сумма операции", "Валюта операции", "Описание", "Статус"]
+
+
+def operation_hashes(df: pd.DataFrame) -> np.ndarray:
+    '''
+    стабильный между запусками хэш ключевых колонок операции
+
+    одинаковые покупки (та же дата, карта, сумма и описание) дают один хэш,
+    поэтому Dataset считает, сколько раз каждый хэш уже встречался
+    '''
+    columns = [name for name in KEY_COLUMNS if name in df.columns] or list(df.columns)
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+
+def _count_hashes(hashes: np.ndarray) -> dict[int, int]:
+    values, counts = np.unique(hashes, return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+class Dataset:
+    '''
+    общий для процесса доступ к операциям
+
+    файл читается не при импорте, а при первом вызове load(),
+    дальше все модули получают один и тот же дата-фрейм;
+    compact - хранить операции в компактной схеме (schema.compact_operations)
+    '''
+
+    def __init__(self, path: str | Path, compact: bool = False):
+        self.path = Path(path)
+        self.compact = compact
+        self.version = 0
+        self._frame: pd.DataFrame | None = None
+        self._counts: dict[int, int] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._frame is not None
+
+    def load(self) -> pd.DataFrame:
+        '''возвращает операции, при первом обращении читает файл'''
+        frame = self._frame
+        if frame is None:
+            with self._lock:
+                if self._frame is None:
+                    self._set_frame(read_operations(self.path, self.compact))
+                frame = self._frame
+        return frame
+
+    def reload(self) -> pd.DataFrame:
+        '''перечитывает файл, например после того как выгрузка обновилась'''
+        with self._lock:
+            frame = read_operations(self.path, self.compact)
+            self._set_frame(frame)
+        return frame
+
+    def append(self, delta: pd.DataFrame | str | Path, *, full_export: bool) -> pd.DataFrame:
+        '''
+        дописывает новые операции (фрейм или файл выгрузки) без перечитывания всей книги
+
+        full_export=True - полная повторная выгрузка: строка добавляется, только если таких
+        же операций (operation_hashes) в ней больше, чем уже известно;
+        full_export=False - только новые операции: добавляются все строки, даже если
+        такая же покупка уже была;
+        индексы и агрегаты дописываются только новыми строками; возвращает добавленные строки
+        '''
+        if not isinstance(delta, pd.DataFrame):
+            delta = read_operations(delta, self.compact)
+        elif self.compact:
+            delta = compact_operations(delta)
+        frame = self.load()
+        with self._lock:
+            frame = self._frame
+            if self._counts is None:
+                self._counts = _count_hashes(operation_hashes(frame))
+            delta = delta.reindex(columns=frame.columns)
+            if self.compact:
+                frame, delta = align_categories(frame, delta)
+            hashes = operation_hashes(delta)
+            if full_export:
+                # номер повтора строки в выгрузке против числа уже известных таких операций
+                occurrence = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+                known = np.fromiter(
+                    (self._counts.get(value, 0) for value in hashes.tolist()), dtype=np.int64, count=len(hashes)
+                )
+                fresh = occurrence >= known
+                delta, hashes = delta[fresh].reset_index(drop=True), hashes[fresh]
+            if delta.empty:
+                return delta
+            for value, count in _count_hashes(hashes).items():
+                self._counts[value] = self._counts.get(value, 0) + count
+            new_frame = pd.concat([frame, delta], ignore_index=True)
+            delta.index = delta.index + len(frame)
+            _own(new_frame)
+            carry_over(self._frame, new_frame, delta)
+            self._frame = new_frame
+            self.version += 1
+        return delta
+
+    def set_frame(self, frame: pd.DataFrame) -> None:
+        '''
+        подменяет операции готовым фреймом (синтетические данные, потоковая загрузка);
+        фрейм переходит к Dataset и дальше на месте не меняется
+        '''
+        with self._lock:
+            self._set_frame(frame)
+
+    def _set_frame(self, frame: pd.DataFrame) -> None:
+        _own(frame)
+        self._frame = frame
+        self._counts = None
+        self.version += 1
+
+
+dataset = Dataset(OPERATIONS_PATH, compact=True)
@@ -0,0 +1,137 @@
+import copy
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Hashable
+
+import pandas as pd
+
+from loader import frame_fingerprint
+
+MAX_ENTRIES = 256
+MAX_BYTES = 64 * 2**20
+
+
+def freeze(value: Any) -> Hashable:
+    '''аргументы в хэшируемый ключ: списки и словари превращаются в кортежи'''
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    hash(value)
+    return value
+
+
+def size_of(value: Any) -> int:
+    '''примерный размер результата в байтах'''
+    if isinstance(value, pd.DataFrame):
+        # по 8 байт на ячейку и индекс: строки в копиях общие, копируются только ссылки,
+        # а memory_usage(deep=True) на сотнях небольших фреймов стоит дороже самого расчета
+        return 8 * len(value) * (len(value.columns) + 1)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(size_of(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(size_of(key) + size_of(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    '''
+    LRU кэш результатов, ограниченный числом записей и суммарным размером
+
+    значения хранятся копиями и отдаются копиями, чтобы вызывающий
+    не мог испортить закэшированный результат
+    '''
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[Hashable, tuple[int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return False, None
+            self._items.move_to_end(key)
+            self.hits += 1
+        return True, copy.deepcopy(item[1])
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = size_of(value)
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[0]
+            self._items[key] = (size, value)
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                _, (old_size, _) = self._items.popitem(last=False)
+                self._bytes -= old_size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+
+def call_key(func: Callable, args: tuple, kwargs: dict) -> Hashable | None:
+    '''
+    ключ вызова: отпечаток фрейма операций (первый аргумент) и остальные аргументы;
+    None - вызов не кэшируется: аргументы не хэшируются или фрейм не из Dataset
+    и может измениться на месте (loader.frame_fingerprint)
+    '''
+    if not args or not isinstance(args[0], pd.DataFrame):
+        return None
+    fingerprint = frame_fingerprint(args[0])
+    if fingerprint is None:
+        return None
+    try:
+        return (func.__module__, func.__qualname__, fingerprint, freeze(args[1:]), freeze(kwargs))
+    except TypeError:
+        return None
+
+
+def memoize(max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES) -> Callable:
+    '''
+    кэширует результат функции от (операции, аргументы...)
+
+    при изменении операций (append, set_frame, reload) у фрейма новый отпечаток,
+    старые записи больше не находятся и вытесняются по LRU;
+    кэш функции доступен как func.cache
+    '''
+    def decorator(func: Callable) -> Callable:
+        cache = ResultCache(max_entries, max_bytes)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = call_key(func, args, kwargs)
+            if key is None:
+                return func(*args, **kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterator
+
+
+@dataclass
+class StageStats:
+    '''накопленные показатели одного этапа'''
+
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    alloc_bytes: int = 0
+
+
+@dataclass
+class StageRun:
+    '''показатели одного прохода этапа, rows можно указать внутри блока'''
+
+    name: str
+    rows: int = 0
+    seconds: float = 0.0
+    alloc_bytes: int = 0
+
+    def as_dict(self) -> dict:
+        return {"seconds": self.seconds, "rows": self.rows, "alloc_bytes": self.alloc_bytes}
+
+
+class Metrics:
+    '''
+    время, число вызовов, обработанные строки и прирост памяти по этапам
+
+    память считается через tracemalloc, только если он включен (trace_memory),
+    иначе alloc_bytes остается 0 и замеры почти ничего не стоят
+    '''
+
+    def __init__(self):
+        self._stages: dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def trace_memory(enabled: bool = True) -> None:
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0) -> Iterator[StageRun]:
+        '''замеряет блок кода: with metrics.stage("all_cards", rows=len(df)) as run: ...'''
+        run = StageRun(name, rows)
+        tracing = tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            yield run
+        finally:
+            run.seconds = time.perf_counter() - start
+            if tracing and tracemalloc.is_tracing():
+                run.alloc_bytes = tracemalloc.get_traced_memory()[0] - before
+            with self._lock:
+                stats = self._stages.setdefault(name, StageStats())
+                stats.calls += 1
+                stats.seconds += run.seconds
+                stats.rows += run.rows
+                stats.alloc_bytes += run.alloc_bytes
+
+    def timed(self, name: str | None = None) -> Callable:
+        '''декоратор: замеряет функцию, строки берутся из длины первого аргумента'''
+        def decorator(func: Callable) -> Callable:
+            stage_name = name or func.__name__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                rows = len(args[0]) if args and hasattr(args[0], "__len__") else 0
+                with self.stage(stage_name, rows):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                name: {"calls": s.calls, "seconds": s.seconds, "rows": s.rows, "alloc_bytes": s.alloc_bytes}
+                for name, s in self._stages.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def prometheus_text(self) -> str:
+        '''показатели в текстовом формате Prometheus'''
+        series = [
+            ("stage_calls_total", "Число вызовов этапа", "calls"),
+            ("stage_seconds_total", "Суммарное время этапа, секунды", "seconds"),
+            ("stage_rows_total", "Обработано строк операций", "rows"),
+            ("stage_alloc_bytes_total", "Прирост памяти по tracemalloc, байты", "alloc_bytes"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for metric, help_text, key in series:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, values in sorted(snapshot.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}{{stage="{label}"}} {values[key]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        '''пишет показатели в файл (например для node_exporter textfile collector)'''
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.prometheus_text(), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
@@ -0,0 +1,149 @@
+'''
+запросы к операциям: фильтры, группировки и топ
+
+    execute(df, Query(GroupSum(("Номер карты",), ("Сумма платежа",), count=True), where=(PAYMENTS,)))
+    execute(df, Query(Top(5), period(start, end)))
+
+на нем построены CardSummary, CategoryIndex, RunningTop и top_transactions;
+окна по датам для spending_by_category ищутся напрямую через OperationsStore
+'''
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from schema import PAYMENT_DATE, PAYMENT_MONTH, PAYMENT_YEAR, date_parts, payment_dates
+
+AMOUNT = "Сумма платежа"
+
+_OPERATORS = {
+    "lt": lambda column, value: column < value,
+    "le": lambda column, value: column <= value,
+    "gt": lambda column, value: column > value,
+    "ge": lambda column, value: column >= value,
+    "eq": lambda column, value: column == value,
+    "isin": lambda column, value: column.isin(value),
+    "notna": lambda column, value: column.notna(),
+}
+
+
+@dataclass(frozen=True)
+class Filter:
+    '''условие на колонку, op - одно из lt, le, gt, ge, eq, isin, notna'''
+
+    column: str
+    op: str
+    value: Any = None
+
+    def __post_init__(self):
+        # запросы хешируемые, поэтому списки значений хранятся кортежами
+        if isinstance(self.value, (list, set)):
+            object.__setattr__(self, "value", tuple(self.value))
+
+
+PAYMENTS = Filter(AMOUNT, "lt", 0)
+
+
+def period(start: datetime | None = None, end: datetime | None = None) -> tuple[Filter, ...]:
+    '''платежи с известной датой в периоде [start, end], границы можно не указывать'''
+    filters = [Filter(PAYMENT_DATE, "notna")]
+    if start is not None:
+        filters.append(Filter(PAYMENT_DATE, "ge", start))
+    if end is not None:
+        filters.append(Filter(PAYMENT_DATE, "le", end))
+    return tuple(filters)
+
+
+@dataclass(frozen=True)
+class GroupSum:
+    '''суммы колонок sums по группам by, count - добавить число строк в колонку "count"'''
+
+    by: tuple[str, ...]
+    sums: tuple[str, ...]
+    count: bool = False
+    sort: bool = True
+
+
+@dataclass(frozen=True)
+class Top:
+    '''n строк с наименьшим column (самые крупные траты), by - отдельно для каждой группы'''
+
+    n: int
+    by: str | None = None
+    column: str = AMOUNT
+
+
+@dataclass(frozen=True)
+class Query:
+    op: GroupSum | Top
+    where: tuple[Filter, ...] = ()
+
+
+class _Scan:
+    '''проход по фрейму для одного запроса: колонки считаются один раз, в том числе вычисляемые'''
+
+    def __init__(self, df: pd.DataFrame, columns: Mapping[str, Callable[[pd.DataFrame], pd.Series]]):
+        self.df = df
+        self.derived = columns
+        self._columns: dict[str, pd.Series] = {}
+
+    def column(self, name: str) -> pd.Series:
+        if name not in self._columns:
+            if name in self.derived:
+                self._columns[name] = self.derived[name](self.df)
+            elif name == PAYMENT_DATE:
+                self._columns[name] = payment_dates(self.df[name])
+            elif name in (PAYMENT_YEAR, PAYMENT_MONTH) and name not in self.df.columns:
+                self._columns[PAYMENT_YEAR], self._columns[PAYMENT_MONTH] = date_parts(self.df)
+            else:
+                self._columns[name] = self.df[name]
+        return self._columns[name]
+
+    def mask(self, where: tuple[Filter, ...]) -> np.ndarray | None:
+        '''маска условий; None - условий нет, подходят все строки'''
+        mask = None
+        for item in where:
+            current = np.asarray(_OPERATORS[item.op](self.column(item.column), item.value), dtype=bool)
+            mask = current if mask is None else mask & current
+        return mask
+
+    def group_sums(self, where: tuple[Filter, ...], op: GroupSum) -> pd.DataFrame:
+        mask = self.mask(where)
+        sums = list(op.sums)
+        data = {}
+        for name in dict.fromkeys(op.by + op.sums):
+            column = self.column(name)
+            data[name] = column if mask is None else column[mask]
+        grouped = pd.DataFrame(data).groupby(list(op.by), sort=op.sort, observed=True)
+        result = grouped[sums].sum() if sums else pd.DataFrame(index=grouped.size().index)
+        if op.count:
+            result["count"] = grouped.size()
+        return result
+
+    def top(self, where: tuple[Filter, ...], op: Top) -> pd.DataFrame:
+        '''строки выбираются по позициям: метки индекса фрейма могут повторяться'''
+        mask = self.mask(where)
+        frame = self.df if mask is None else self.df[mask]
+        values = frame[op.column].reset_index(drop=True)
+        if op.by is None:
+            return frame.iloc[values.nsmallest(op.n).index]
+        groups = frame[op.by].reset_index(drop=True)
+        top = values.groupby(groups, observed=True).nsmallest(op.n)
+        return frame.iloc[top.index.get_level_values(-1)]
+
+
+def execute(
+    df: pd.DataFrame,
+    query: Query,
+    columns: Mapping[str, Callable[[pd.DataFrame], pd.Series]] | None = None,
+) -> pd.DataFrame:
+    '''
+    выполняет запрос: GroupSum - фрейм сумм с ключами групп в индексе, Top - строки операций;
+    columns - вычисляемые колонки {имя: функция от фрейма}, их можно использовать в запросе
+    '''
+    scan = _Scan(df, columns or {})
+    if isinstance(query.op, GroupSum):
+        return scan.group_sums(query.where, query.op)
+    return scan.top(query.where, query.op)
@@ -0,0 +1,293 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from metrics import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+EXCHANGE_RATES_URL = "https://api.apilayer.com/exchangerates_data"
+FINNHUB_URL = "https://finnhub.io/api/v1"
+QUOTES_DB_PATH = Path(__file__).resolve().parent.parent / "data" / ".cache" / "quotes.sqlite3"
+
+
+def _requests():
+    '''
+    requests импортируется при первом сетевом запросе: это около 0.1 с из времени импорта views,
+    а при свежей истории котировок сеть на старте не нужна вовсе
+    '''
+    import requests
+    return requests
+
+
+class TTLCache:
+    '''простой потокобезопасный кэш, записи которого живут ttl секунд'''
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._data: dict[Any, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= self._clock():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class QuoteHistory:
+    '''
+    история полученных курсов и цен в SQLite: (вид, символ, время получения, значение)
+
+    вид - "rate:<базовая валюта>" для курсов и "stock" для акций;
+    база открывается при первом обращении, запись и чтение под одной блокировкой
+    '''
+
+    def __init__(self, path: str | Path = QUOTES_DB_PATH):
+        self.path = Path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quotes ("
+                "kind TEXT NOT NULL, symbol TEXT NOT NULL, fetched_at REAL NOT NULL, value REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS quotes_lookup ON quotes (kind, symbol, fetched_at)")
+            self._conn = conn
+        return self._conn
+
+    def record(self, kind: str, values: dict[str, float], fetched_at: float | None = None) -> None:
+        '''сохраняет значения {символ: значение}, полученные одним запросом'''
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO quotes (kind, symbol, fetched_at, value) VALUES (?, ?, ?, ?)",
+                    [(kind, symbol, fetched_at, value) for symbol, value in values.items()],
+                )
+
+    def latest(self, kind: str, symbols: list[str]) -> tuple[float, dict[str, float]] | None:
+        '''
+        последние известные значения символов и время самого старого из них,
+        None - если хотя бы одного символа в истории нет
+        '''
+        values: dict[str, float] = {}
+        oldest = float("inf")
+        with self._lock:
+            conn = self._connect()
+            for symbol in symbols:
+                row = conn.execute(
+                    "SELECT fetched_at, value FROM quotes WHERE kind = ? AND symbol = ? "
+                    "ORDER BY fetched_at DESC LIMIT 1",
+                    (kind, symbol),
+                ).fetchone()
+                if row is None:
+                    return None
+                oldest = min(oldest, row[0])
+                values[symbol] = row[1]
+        return oldest, values
+
+    def history(
+        self, kind: str, symbol: str, start: float = 0.0, end: float = float("inf")
+    ) -> list[tuple[float, float]]:
+        '''значения символа за период [start, end] в порядке времени: [(время, значение), ...]'''
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT fetched_at, value FROM quotes WHERE kind = ? AND symbol = ? "
+                "AND fetched_at BETWEEN ? AND ? ORDER BY fetched_at",
+                (kind, symbol, start, min(end, 1e18)),
+            ).fetchall()
+        return [(fetched_at, value) for fetched_at, value in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class QuoteFetcher:
+    '''
+    получает курсы валют и цены акций
+
+    запросы идут параллельно через пул потоков и общую сессию с keep-alive,
+    у каждого запроса свой таймаут, ответы кэшируются на ttl секунд
+
+    с историей (history) полученные значения сохраняются на диск:
+    моложе fresh_for секунд - отдаются без запроса, моложе stale_for -
+    отдаются сразу, а обновление идет в фоне; более старые запрашиваются заново,
+    и если API недоступен, отдается последнее известное значение
+    '''
+
+    def __init__(
+        self,
+        rates_url: str = EXCHANGE_RATES_URL,
+        stocks_url: str = FINNHUB_URL,
+        timeout: float = 5.0,
+        ttl: float = 60.0,
+        max_workers: int = 8,
+        history: QuoteHistory | None = None,
+        fresh_for: float = 60.0,
+        stale_for: float = 24 * 60 * 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.rates_url = rates_url.rstrip("/")
+        self.stocks_url = stocks_url.rstrip("/")
+        self.timeout = timeout
+        self.cache = TTLCache(ttl)
+        self.history = history
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self._clock = clock
+        self._refreshing: set[tuple] = set()
+        self._refresh_lock = threading.Lock()
+        self._max_workers = max_workers
+        self._session: "requests.Session | None" = None
+        self._session_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quotes")
+
+    @property
+    def session(self) -> "requests.Session":
+        '''общая сессия с пулом соединений, создается при первом запросе'''
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    from requests.adapters import HTTPAdapter
+
+                    session = _requests().Session()
+                    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self._max_workers)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def _fetch_rates(self, symbols: str, base: str) -> dict[str, float]:
+        with metrics.stage("http.exchange_rates"):
+            response = self.session.get(
+                f"{self.rates_url}/latest",
+                params={"symbols": symbols, "base": base},
+                headers={"apikey": os.getenv("SAFE_API_LAYER_KEY", "")},
+                timeout=self.timeout,
+            )
+        response.raise_for_status()
+        return {currency: round(1 / value, 2) for currency, value in response.json().get("rates").items()}
+
+    def _fetch_stock(self, stock: str) -> dict[str, float]:
+        with metrics.stage("http.finnhub"):
+            response = self.session.get(
+                f"{self.stocks_url}/quote",
+                params={"symbol": stock},
+                headers={"X-Finnhub-Token": os.getenv("API_FINNHUB", "")},
+                timeout=self.timeout,
+            )
+        response.raise_for_status()
+        return {stock: response.json()["c"]}
+
+    def _refresh(self, key: tuple, kind: str, fetch: Callable[[], dict[str, float]]) -> dict[str, float]:
+        values = fetch()
+        if self.history is not None:
+            self.history.record(kind, values, self._clock())
+        self.cache.set(key, values)
+        return values
+
+    def _refresh_in_background(self, key: tuple, kind: str, fetch: Callable[[], dict[str, float]]) -> None:
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._refresh(key, kind, fetch)
+            except _requests().RequestException:
+                pass  # остается последнее известное значение, попробуем при следующем обращении
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def _values(self, key: tuple, kind: str, symbols: list[str], fetch: Callable[[], dict[str, float]]) -> dict:
+        '''значения из памяти, из истории по политике устаревания или из сети'''
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        known = self.history.latest(kind, symbols) if self.history is not None and symbols else None
+        if known is not None:
+            fetched_at, values = known
+            age = self._clock() - fetched_at
+            if age < self.fresh_for:
+                return values
+            if age < self.stale_for:
+                self._refresh_in_background(key, kind, fetch)
+                return values
+        try:
+            return self._refresh(key, kind, fetch)
+        except _requests().RequestException:
+            if known is None:
+                raise
+            return known[1]
+
+    def currency_rates(self, symbols: str, base: str = "RUB") -> list[dict]:
+        '''выдает курс валют к рублю в настоящие время'''
+        names = [name.strip() for name in symbols.split(",") if name.strip()]
+        rates = self._values(
+            ("rates", symbols, base), f"rate:{base}", names, lambda: self._fetch_rates(symbols, base)
+        )
+        return [{"currency": currency, "rate": rate} for currency, rate in rates.items()]
+
+    def stock_price(self, stock: str) -> dict:
+        '''выдает цену акции в настоящие время'''
+        prices = self._values(("stock", stock), "stock", [stock], lambda: self._fetch_stock(stock))
+        return {"stock": stock, "price": prices[stock]}
+
+    def stock_prices(self, stocks: list[str]) -> list[dict]:
+        '''цены нескольких акций, запросы выполняются параллельно'''
+        futures = [self._executor.submit(self.stock_price, stock) for stock in stocks]
+        return [future.result() for future in futures]
+
+    def submit_all(self, symbols: str, stocks: list[str]) -> tuple[Future, list[Future]]:
+        '''запускает все запросы в фоне, чтобы параллельно считать локальные данные'''
+        rates_future = self._executor.submit(self.currency_rates, symbols)
+        stock_futures = [self._executor.submit(self.stock_price, stock) for stock in stocks]
+        return rates_future, stock_futures
+
+    def fetch_all(self, symbols: str, stocks: list[str]) -> tuple[list[dict], list[dict]]:
+        '''курсы валют и цены акций одним параллельным заходом'''
+        rates_future, stock_futures = self.submit_all(symbols, stocks)
+        return rates_future.result(), [future.result() for future in stock_futures]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        if self._session is not None:
+            self._session.close()
+        if self.history is not None:
+            self.history.close()
+
+
+quote_fetcher = QuoteFetcher(history=QuoteHistory())
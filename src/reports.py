@@ -1,81 +1,453 @@
+import atexit
+import gzip
+import io
 import json
 import logging
 import os
-import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from functools import wraps
-from typing import Callable
+from typing import Callable, Iterable, Iterator, TextIO
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from loader import dataset, read_excel_file  # noqa: F401
+from memo import MAX_ENTRIES, call_key, memoize
+from metrics import metrics
+from schema import format_dates
+from store import store_for
+
 log_dir = Path("logs_output")
-log_dir.mkdir(parents=True, exist_ok=True)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+_logger_lock = threading.Lock()
+
+
+def get_logger() -> logging.Logger:
+    '''настраивает логгер при первом обращении: создает папку логов и файловый обработчик'''
+    if not logger.handlers:
+        with _logger_lock:
+            if not logger.handlers:
+                log_dir.mkdir(parents=True, exist_ok=True)
+                file_handler = logging.FileHandler(log_dir / f"{__name__}.log", encoding="utf-8")
+                file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+                file_handler.setFormatter(file_formatter)
+                logger.setLevel(logging.INFO)
+                logger.addHandler(file_handler)
+    return logger
+
+
+def __getattr__(name: str):
+    # df раньше читался при импорте, теперь берется из общего dataset
+    if name == "df":
+        return dataset.load()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+REPORT_COLUMNS = ["Дата платежа", "Категория", "Сумма платежа"]
+CHUNK_SIZE = 10_000
+
+
+FORMATS = ("json", "ndjson", "csv", "parquet")
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+class ReportTable:
+    '''
+    строки отчета, подготовленные один раз: колонки отчета списками, даты уже строками
+
+    все форматы одного экспорта пишутся из одной таблицы, фрейм заново не разбирается
+    '''
+
+    def __init__(self, result: pd.DataFrame):
+        self.total = frame_total(result)
+        self.columns = {
+            name: format_dates(result[name]) if name == "Дата платежа" else result[name].tolist()
+            for name in REPORT_COLUMNS
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns[REPORT_COLUMNS[0]])
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[list[dict]]:
+        values = [self.columns[name] for name in REPORT_COLUMNS]
+        for start in range(0, len(self), chunk_size):
+            yield [dict(zip(REPORT_COLUMNS, row)) for row in zip(*(v[start:start + chunk_size] for v in values))]
+
+    def frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns, columns=REPORT_COLUMNS)
+
+
+def _is_report(item) -> bool:
+    return isinstance(item, (pd.DataFrame, ReportTable))
+
+
+def iter_report_rows(result: pd.DataFrame | ReportTable, chunk_size: int = CHUNK_SIZE) -> Iterator[list[dict]]:
+    '''отдает строки отчета пачками по chunk_size, не собирая весь список в памяти'''
+    if isinstance(result, ReportTable):
+        yield from result.chunks(chunk_size)
+        return
+    columns = [result[name] for name in REPORT_COLUMNS]
+    for start in range(0, len(result), chunk_size):
+        values = []
+        for name, column in zip(REPORT_COLUMNS, columns):
+            part = column.iloc[start:start + chunk_size]
+            values.append(format_dates(part) if name == "Дата платежа" else part.tolist())
+        yield [dict(zip(REPORT_COLUMNS, row)) for row in zip(*values)]
+
+
+def write_json_report(
+    file: TextIO, total_sum: float, chunks: Iterable[list[dict]], compact: bool = False, level: int = 0
+) -> None:
+    '''
+    пишет отчет {"total_sum": ..., "transactions": [...]} по мере поступления строк
+
+    без compact результат совпадает с json.dump(..., indent=2),
+    level - уровень вложенности, если отчет пишется внутрь другого документа
+    '''
+    if compact:
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        file.write(f'{{"total_sum":{encoder.encode(total_sum)},"transactions":[')
+        first = True
+        for chunk in chunks:
+            parts = [encoder.encode(row) for row in chunk]
+            file.write(("" if first else ",") + ",".join(parts))
+            first = first and not parts
+        file.write("]}")
+        return
+
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+    pad = "  " * level
+    file.write(f'{{\n{pad}  "total_sum": {encoder.encode(total_sum)},\n{pad}  "transactions": [')
+    first = True
+    for chunk in chunks:
+        parts = [f"\n{pad}    " + encoder.encode(row).replace("\n", f"\n{pad}    ") for row in chunk]
+        file.write(("" if first else ",") + ",".join(parts))
+        first = first and not parts
+    file.write(f"]\n{pad}}}" if first else f"\n{pad}  ]\n{pad}}}")
+
+
+def write_ndjson_report(file: TextIO, total_sum: float, chunks: Iterable[list[dict]]) -> None:
+    '''пишет отчет построчно: первая строка - итог, дальше по одной транзакции на строку'''
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    file.write(encoder.encode({"total_sum": total_sum}) + "\n")
+    for chunk in chunks:
+        file.write("".join(encoder.encode(row) + "\n" for row in chunk))
+
+
+def frame_total(result: pd.DataFrame | ReportTable) -> float:
+    '''итог отчета: модуль суммы платежей'''
+    if isinstance(result, ReportTable):
+        return result.total
+    return float(abs(result["Сумма платежа"].sum())) if not result.empty else 0.0
+
+
+def write_frame_report(file: TextIO, result: pd.DataFrame, fmt: str = "json", compact: bool = False) -> None:
+    chunks = iter_report_rows(result)
+    if fmt == "ndjson":
+        write_ndjson_report(file, frame_total(result), chunks)
+    else:
+        write_json_report(file, frame_total(result), chunks, compact=compact)
+
+
+def write_combined_report(file: TextIO, results: list[pd.DataFrame], fmt: str = "json", compact: bool = False) -> None:
+    '''
+    пишет несколько отчетов в один файл: {"reports": [отчет, ...]} в порядке запросов;
+    в ndjson каждый отчет начинается строкой {"report": номер, "total_sum": ...}
+    '''
+    if fmt == "ndjson":
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        for number, result in enumerate(results):
+            file.write(encoder.encode({"report": number, "total_sum": frame_total(result)}) + "\n")
+            for chunk in iter_report_rows(result):
+                file.write("".join(encoder.encode(row) + "\n" for row in chunk))
+        return
+    if compact:
+        file.write('{"reports":[')
+        for number, result in enumerate(results):
+            file.write("," if number else "")
+            write_json_report(file, frame_total(result), iter_report_rows(result), compact=True)
+        file.write("]}")
+        return
+    file.write('{\n  "reports": [')
+    for number, result in enumerate(results):
+        file.write(",\n    " if number else "\n    ")
+        write_json_report(file, frame_total(result), iter_report_rows(result), level=2)
+    file.write("\n  ]\n}" if results else "]\n}")
+
+
+def _report_frame(result) -> pd.DataFrame:
+    '''таблица для csv и parquet; несколько отчетов - одна таблица с номером отчета'''
+    if _is_report(result):
+        return result.frame() if isinstance(result, ReportTable) else ReportTable(result).frame()
+    if isinstance(result, list) and result and all(_is_report(item) for item in result):
+        frames = [_report_frame(item) for item in result]
+        return pd.concat(frames, keys=range(len(frames)), names=["Отчет", None]).reset_index(level=0)
+    raise ValueError("csv и parquet поддерживаются только для отчетов по операциям")
+
+
+@contextmanager
+def _open_report(file_path: str, compression: str | None = None) -> Iterator[TextIO]:
+    '''текстовый файл отчета, при compression - со сжатием gzip или zstd'''
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"неизвестное сжатие отчета: {compression}")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("для сжатия zstd нужен пакет zstandard") from None
+        with open(file_path, "wb") as raw:
+            with io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8") as f:
+                yield f
+    elif compression == "gzip":
+        with gzip.open(file_path, "wt", encoding="utf-8") as f:
+            yield f
+    else:
+        with open(file_path, "w", encoding="utf-8") as f:
+            yield f
+
+
+def save_report(
+    result, file_path: str, fmt: str = "json", compact: bool = False, compression: str | None = None
+) -> None:
+    '''сохраняет результат функции в файл: json, ndjson, csv или parquet, при compression - со сжатием'''
+    if fmt not in FORMATS:
+        raise ValueError(f"неизвестный формат отчета: {fmt}")
+    if fmt == "parquet":
+        # у parquet сжатие внутреннее, по колонкам
+        _report_frame(result).to_parquet(file_path, index=False, compression=compression)
+        return
+    if fmt == "csv":
+        frame = _report_frame(result)
+        with _open_report(file_path, compression) as f:
+            frame.to_csv(f, index=False)
+        return
+    with _open_report(file_path, compression) as f:
+        if _is_report(result):
+            get_logger().info("входные данные прошли проверку работа продолжается")
+            write_frame_report(f, result, fmt=fmt, compact=compact)
+        elif isinstance(result, list) and result and all(_is_report(item) for item in result):
+            get_logger().info("входные данные прошли проверку работа продолжается")
+            write_combined_report(f, result, fmt=fmt, compact=compact)
+        else:
+            if fmt == "ndjson" and isinstance(result, list):
+                for item in result:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            elif fmt == "ndjson" or compact:
+                json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            get_logger().info("отчет составлен и будет сохранен в виде отдельного файла")
 
-log_file = log_dir / f"{__name__}.log"
-file_handler = logging.FileHandler(log_file)
 
-file_formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(file_formatter)
+def prepare_report(result):
+    '''фреймы результата в ReportTable, остальное как есть'''
+    if isinstance(result, pd.DataFrame):
+        return ReportTable(result)
+    if isinstance(result, list) and result and all(isinstance(item, pd.DataFrame) for item in result):
+        return [ReportTable(item) for item in result]
+    return result
 
-logger.addHandler(file_handler)
 
+def export_report(
+    result, paths: dict[str, str], compact: bool = False, compression: str | None = None, max_workers: int = 4
+) -> None:
+    '''
+    сохраняет результат сразу в нескольких форматах: paths - {формат: путь}
 
+    строки готовятся один раз (prepare_report), файлы пишутся параллельно в пуле потоков
+    '''
+    if len(paths) == 1:
+        (fmt, file_path), = paths.items()
+        save_report(result, file_path, fmt=fmt, compact=compact, compression=compression)
+        return
+    for fmt in paths:
+        if fmt not in FORMATS:
+            raise ValueError(f"неизвестный формат отчета: {fmt}")
+    prepared = prepare_report(result)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths)), thread_name_prefix="report-export") as pool:
+        futures = [
+            pool.submit(save_report, prepared, file_path, fmt, compact, compression)
+            for fmt, file_path in paths.items()
+        ]
+        for future in futures:
+            future.result()
 
-def read_excel_file(road_to_excel_file: str):
-    """возврощает excel файлы в ввиде словоря"""
-    return pd.read_excel(road_to_excel_file)
 
+def report_paths(
+    name: str, formats: tuple[str, ...], compression: str | None = None, exact: bool = False
+) -> dict[str, str]:
+    '''
+    пути файлов отчета в папке reports: имя + расширение формата и сжатия;
+    exact - имя задано пользователем целиком и для одного формата берется как есть
+    '''
+    suffix = COMPRESSION_SUFFIXES.get(compression, "")
+    if exact and len(formats) == 1:
+        file_name = name if name.endswith(suffix) or formats[0] == "parquet" else name + suffix
+        return {formats[0]: os.path.join("reports", file_name)}
+    stem = Path(name).stem if exact else name
+    return {
+        fmt: os.path.join("reports", f"{stem}.{fmt}" + ("" if fmt == "parquet" else suffix))
+        for fmt in formats
+    }
 
-df = read_excel_file("../data/operations.xlsx")
 
+class ReportWriter:
+    '''
+    сохраняет отчеты в фоновом потоке
 
-def report_to_file(filename: str | None = None) -> Callable:
-    logger.info("Начата обработка функции")
+    очередь ограничена maxsize: если поток не успевает, submit ждет (back-pressure);
+    flush() дожидается записи всех отчетов, ошибки пишутся в лог модуля
+    '''
+
+    def __init__(self, maxsize: int = 16):
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(
+        self, result, file_path: str, fmt: str = "json", compact: bool = False, compression: str | None = None
+    ) -> None:
+        '''ставит отчет в очередь; результат не должен меняться после вызова'''
+        self.submit_export(result, {fmt: file_path}, compact=compact, compression=compression)
+
+    def submit_export(
+        self, result, paths: dict[str, str], compact: bool = False, compression: str | None = None
+    ) -> None:
+        '''ставит в очередь отчет в нескольких форматах (export_report)'''
+        self._ensure_started()
+        self._queue.put((result, paths, compact, compression))
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                result, paths, compact, compression = item
+                for file_path in paths.values():
+                    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+                export_report(result, paths, compact=compact, compression=compression)
+                print(f"📄 Отчет сохранен: {', '.join(paths.values())}")
+            except Exception:
+                get_logger().exception("не удалось сохранить отчет %s", ", ".join(item[1].values()))
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        '''ждет, пока все поставленные отчеты будут записаны'''
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        '''дописывает очередь и останавливает поток'''
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        atexit.unregister(self.shutdown)
+        self._queue.put(None)
+        thread.join()
+
+
+report_writer = ReportWriter()
+
+
+# уже записанные отчеты: ключ вызова -> [(путь, mtime_ns файла или None для фоновой записи), ...]
+_written: OrderedDict = OrderedDict()
+_written_lock = threading.Lock()
+
+
+def _existing_report(key) -> list[str] | None:
+    '''пути файлов отчета, который уже записан для этого вызова и с тех пор не менялся'''
+    if key is None:
+        return None
+    with _written_lock:
+        files = _written.get(key)
+    if files is None:
+        return None
+    for file_path, mtime_ns in files:
+        try:
+            current = os.stat(file_path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime_ns is not None and mtime_ns != current:
+            return None
+    return [file_path for file_path, _ in files]
+
+
+def _remember_report(key, files: list[tuple[str, int | None]]) -> None:
+    if key is None:
+        return
+    with _written_lock:
+        _written[key] = files
+        _written.move_to_end(key)
+        while len(_written) > MAX_ENTRIES:
+            _written.popitem(last=False)
+
+
+def report_to_file(
+    filename: str | None = None,
+    fmt: str | tuple[str, ...] = "json",
+    compact: bool = False,
+    background: bool = False,
+    compression: str | None = None,
+) -> Callable:
     '''
     записывает вывод функции в json файл
 
     filename: авто имя или заданное пользователем
+    fmt: "json" - один документ, "ndjson" - по одной записи на строку, "csv", "parquet"
+    (нужен pyarrow); кортеж форматов - все файлы пишутся параллельно из одной подготовки строк
+    compact: json без отступов
+    background: файл пишется в фоне через report_writer, функция сразу возвращает результат
+    compression: "gzip" или "zstd" (нужен zstandard), к имени добавляется .gz / .zst
+
+    если отчет для тех же операций и аргументов уже записан и файл не менялся,
+    он не пишется повторно
     '''
+    formats = (fmt,) if isinstance(fmt, str) else tuple(fmt)
+
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
-            result = func(*args, **kwargs)
+            get_logger().info("Начата обработка функции")
+            with metrics.stage(func.__name__):
+                result = func(*args, **kwargs)
 
-            file_name = (
-                filename
-                or f"report_{func.__name__}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            key = call_key(func, args, kwargs)
+            key = key and (key, filename, formats, compact, compression)
+            existing = _existing_report(key)
+            if existing is not None:
+                print(f"📄 Отчет уже сохранен: {', '.join(existing)}")
+                return result
 
-            )
-            os.makedirs("reports", exist_ok=True)
-            file_path = os.path.join("reports", file_name)
-
-            if isinstance(result, pd.DataFrame):
-                logger.info("входные данные прошли проверку работа продолжается")
-                needed_columns = ["Дата платежа", "Категория", "Сумма платежа"]
-                result_filtered = result[needed_columns].copy()
-                result_filtered["Дата платежа"] = result_filtered[
-                    "Дата платежа"
-                ].dt.strftime("%d.%m.%Y")
-                total_sum = (
-                    float(abs(result_filtered["Сумма платежа"].sum()))
-                    if not result_filtered.empty
-                    else 0.0
-                )
-                json_data = {
-                    "total_sum": total_sum,
-                    "transactions": result_filtered.to_dict("records"),
-                }
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(json_data, f, ensure_ascii=False, indent=2)
+            if filename:
+                paths = report_paths(filename, formats, compression, exact=True)
             else:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(result, f, ensure_ascii=False, indent=2)
-                    logger.info("отчет составлен и будет сохранен в виде отдельного файла")
-            print(f"📄 Отчет сохранен: {file_path}")
+                name = f"report_{func.__name__}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                paths = report_paths(name, formats, compression)
+            if background:
+                report_writer.submit_export(result, paths, compact=compact, compression=compression)
+                _remember_report(key, [(file_path, None) for file_path in paths.values()])
+                return result
+            os.makedirs("reports", exist_ok=True)
+            with metrics.stage(f"report.{func.__name__}", rows=len(result) if hasattr(result, "__len__") else 0):
+                export_report(result, paths, compact=compact, compression=compression)
+            _remember_report(key, [(file_path, os.stat(file_path).st_mtime_ns) for file_path in paths.values()])
+            print(f"📄 Отчет сохранен: {', '.join(paths.values())}")
             return result
 
         return wrapper
@@ -83,25 +455,53 @@ def report_to_file(filename: str | None = None) -> Callable:
     return decorator
 
 
+def _spending_results(df: pd.DataFrame, queries: list[tuple[str, tuple[int, int, int]]]) -> list[pd.DataFrame]:
+    '''
+    траты за 90 дней до даты для каждой пары (категория, дата), новые сверху
+
+    позиции всех окон берутся одним take, строки сортируются один раз по (запрос, дата по убыванию),
+    итоги - одна групповая сумма (bincount по номеру запроса), дальше общий фрейм режется по границам запросов
+    '''
+    store = store_for(df)
+    ends = [datetime(year, month, day) for _, (day, month, year) in queries]
+    windows = store.windows(
+        [category for category, _ in queries], [end - timedelta(days=90) for end in ends], ends
+    )
+    lengths = np.array([len(window) for window in windows], dtype=np.intp)
+    positions = np.concatenate(windows) if windows else np.empty(0, dtype=np.intp)
+    query = np.repeat(np.arange(len(queries)), lengths)
+    dates = store.frame["Дата платежа"].to_numpy("datetime64[ns]")[positions].view(np.int64)
+    # при равных датах строки идут в исходном порядке
+    order = np.lexsort((positions, -dates, query))
+    rows = store.frame.take(positions[order])
+
+    amounts = rows["Сумма платежа"].to_numpy(float)
+    totals = np.abs(np.bincount(query, weights=amounts, minlength=len(queries)))
+    labels = np.array([f"Всего потрачено: {total:.2f} руб" for total in totals.tolist()], dtype=object)
+    rows["Итог"] = np.repeat(labels, lengths)
+    # одна консолидация блоков здесь, а не в каждом copy() среза ниже
+    rows = rows.copy()
+
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    return [
+        rows.iloc[lo:hi].copy() if hi > lo else rows.iloc[:0].drop(columns="Итог")
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+
+
 @report_to_file()
+@memoize()
 def spending_by_category(df_, category, date):
     '''выводит траты по категории и заданной дате на три месяца назад'''
-    df = df_.copy()
-    day, month, year = date
-    df["Дата платежа"] = pd.to_datetime(
-        df["Дата платежа"], format="%d.%m.%Y", dayfirst=True, errors="coerce"
-    )
-    end_date = datetime(year, month, day)
-    start_date = end_date - timedelta(days=90)
-    mask = (
-        (df["Категория"] == category)
-        & (df["Дата платежа"] >= start_date)
-        & (df["Дата платежа"] <= end_date)
-        & (df["Сумма платежа"] < 0)
-    )
-    result = df[mask].sort_values("Дата платежа", ascending=False)
-    if len(result) > 0:
-        total_spent = abs(result["Сумма платежа"].sum())  # модуль суммы
-        result["Итог"] = f"Всего потрачено: {total_spent:.2f} руб"
+    return _spending_results(df_, [(category, date)])[0]
 
-    return result
+
+@report_to_file()
+@memoize()
+def spending_by_categories(df_, queries: list[tuple[str, tuple[int, int, int]]]) -> list[pd.DataFrame]:
+    '''
+    траты для многих пар (категория, дата) за один проход и одним отчетом
+
+    результаты идут в порядке запросов и совпадают с spending_by_category
+    '''
+    return _spending_results(df_, queries)
@@ -0,0 +1,148 @@
+'''
+скользящие траты по категориям за 7/30/90/365 дней на каждый день
+
+    python src/rolling.py --windows 7 30 90 365 --out reports/rolling.csv
+
+траты раскладываются в плотный массив (день × категория) и превращаются
+в префиксные суммы, поэтому сумма за любой период - одно вычитание,
+а скользящие ряды для всех дней считаются одной векторной операцией
+'''
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from loader import cached_for_frame, dataset
+from schema import PAYMENT_DAY, payment_dates
+
+DEFAULT_WINDOWS = (7, 30, 90, 365)
+
+
+def _days(df: pd.DataFrame) -> np.ndarray:
+    '''номер дня платежа (дней с 01.01.1970), -1 - дата не указана'''
+    if PAYMENT_DAY in df.columns:
+        return df[PAYMENT_DAY].to_numpy(np.int64)
+    dates = payment_dates(df["Дата платежа"]).to_numpy("datetime64[D]")
+    return np.where(np.isnat(dates), -1, dates.astype(np.int64))
+
+
+def _day_number(date: datetime) -> int:
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+class DailySpend:
+    '''
+    траты (по модулю) по дням и категориям с префиксными суммами
+
+    суммы округляются до копеек, чтобы убрать погрешность вычитания префиксов;
+    строка i массива - день first_day + i, колонка - категория из categories;
+    новые операции добавляются через append, диапазон дней и список категорий расширяются
+    '''
+
+    def __init__(self, df: pd.DataFrame | None = None):
+        self.first_day = 0
+        self.categories: list[str] = []
+        self._columns: dict[str, int] = {}
+        self._daily = np.zeros((0, 0))
+        self._prefix = np.zeros((1, 0))
+        if df is not None:
+            self.append(df)
+
+    def append(self, df: pd.DataFrame) -> None:
+        days = _days(df)
+        amounts = df["Сумма платежа"].to_numpy(float)
+        category = df["Категория"]
+        pay = (amounts < 0) & (days >= 0) & category.notna().to_numpy()
+        if not pay.any():
+            return
+        days, amounts = days[pay], -amounts[pay]
+        codes, uniques = pd.factorize(category[pay].to_numpy(object))
+
+        known = dict(self._columns)
+        added = []
+        for name in uniques:
+            if name not in known:
+                known[name] = len(known)
+                added.append(name)
+        columns = np.array([known[name] for name in uniques], dtype=np.int64)
+        start = min(days.min(), self.first_day) if len(self._daily) else days.min()
+        stop = max(days.max() + 1, self.first_day + len(self._daily)) if len(self._daily) else days.max() + 1
+
+        daily = np.zeros((stop - start, len(self.categories) + len(added)))
+        offset = self.first_day - start
+        daily[offset:offset + len(self._daily), :len(self.categories)] = self._daily
+        flat = (days - start) * daily.shape[1] + columns[codes]
+        daily += np.bincount(flat, weights=amounts, minlength=daily.size).reshape(daily.shape)
+
+        self.first_day = int(start)
+        self.categories += added
+        self._columns = known
+        self._daily = daily
+        self._prefix = np.vstack([np.zeros((1, daily.shape[1])), np.cumsum(daily, axis=0)])
+
+    def _rows(self, day: int) -> int:
+        '''число строк массива до дня day включительно (с учетом границ)'''
+        return int(np.clip(day - self.first_day + 1, 0, len(self._daily)))
+
+    def total(self, category: str, start: datetime, end: datetime) -> float:
+        '''траты категории за период [start, end] включительно'''
+        column = self._columns.get(category)
+        if column is None:
+            return 0.0
+        hi = self._rows(_day_number(end))
+        lo = self._rows(_day_number(start) - 1)
+        return round(float(self._prefix[hi, column] - self._prefix[lo, column]), 2) if hi > lo else 0.0
+
+    def rolling(self, days: int, start: datetime | None = None, end: datetime | None = None) -> pd.DataFrame:
+        '''
+        траты за days дней, заканчивающиеся каждым днем (включительно):
+        строки - дни от start до end (по умолчанию весь диапазон данных), колонки - категории
+        '''
+        first = self.first_day if start is None else _day_number(start)
+        last = self.first_day + len(self._daily) - 1 if end is None else _day_number(end)
+        day_numbers = np.arange(first, last + 1)
+        hi = np.clip(day_numbers - self.first_day + 1, 0, len(self._daily))
+        lo = np.clip(day_numbers - days - self.first_day + 1, 0, len(self._daily))
+        values = np.round(self._prefix[hi] - self._prefix[lo], 2)
+        index = pd.DatetimeIndex(day_numbers.astype("datetime64[D]").astype("datetime64[ns]"), name="Дата")
+        return pd.DataFrame(values, index=index, columns=self.categories)
+
+    def rolling_all(
+        self, windows: tuple[int, ...] = DEFAULT_WINDOWS, start: datetime | None = None, end: datetime | None = None
+    ) -> pd.DataFrame:
+        '''скользящие траты для нескольких окон: колонки (окно, категория)'''
+        frames = {days: self.rolling(days, start, end) for days in windows}
+        return pd.concat(frames, axis=1, names=["Окно", "Категория"])
+
+
+def daily_spend_for(df: pd.DataFrame) -> DailySpend:
+    '''массив трат для дата-фрейма, строится при первом обращении'''
+    return cached_for_frame(df, "daily_spend", DailySpend)
+
+
+def rolling_spending(
+    df: pd.DataFrame,
+    windows: tuple[int, ...] = DEFAULT_WINDOWS,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> pd.DataFrame:
+    '''
+    скользящие траты по категориям в длинном формате:
+    колонки "Дата", "Окно", "Категория", "Сумма"; нулевые значения не выводятся
+    '''
+    wide = daily_spend_for(df).rolling_all(windows, start, end)
+    long = wide.stack(["Окно", "Категория"], future_stack=True).rename("Сумма").reset_index()
+    return long[long["Сумма"] > 0].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="скользящие траты по категориям на каждый день")
+    parser.add_argument("--windows", type=int, nargs="+", default=list(DEFAULT_WINDOWS), help="окна в днях")
+    parser.add_argument("--out", default="reports/rolling.csv", help="куда записать csv")
+    args = parser.parse_args()
+    result = rolling_spending(dataset.load(), tuple(args.windows))
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    result.to_csv(args.out, index=False, date_format="%d.%m.%Y")
+    print(f"📄 Скользящие траты сохранены: {args.out} ({len(result)} строк)")
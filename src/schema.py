@@ -0,0 +1,137 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+TEXT_COLUMNS = ["Номер карты", "Статус", "Валюта операции", "Валюта платежа", "Категория", "Описание"]
+DATE_COLUMNS = {"Дата операции": "%d.%m.%Y %H:%M:%S", "Дата платежа": "%d.%m.%Y"}
+PAYMENT_DATE = "Дата платежа"
+PAYMENT_FORMAT = DATE_COLUMNS[PAYMENT_DATE]
+# части даты платежа, которые считаются один раз при загрузке; 0 - дата не указана
+PAYMENT_YEAR = "Год платежа"
+PAYMENT_MONTH = "Месяц платежа"
+PAYMENT_DAY = "Номер дня платежа"  # дней с 01.01.1970, -1 - дата не указана
+FORMATTED_CACHE_SIZE = 100_000
+
+
+def to_category(series: pd.Series) -> pd.Series:
+    '''строковая колонка в category: каждая строка хранится один раз, в строках - коды'''
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype("category")
+
+
+def parse_dates(series: pd.Series, fmt: str) -> pd.Series:
+    '''
+    колонка дат-строк в datetime64
+
+    разбирается только каждое уникальное значение, остальное - раскладка по кодам;
+    значения не в формате fmt разбираются по отдельности (день первым),
+    нераспознанные становятся NaT
+    '''
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    categorical = to_category(series)
+    uniques = categorical.cat.categories
+    parsed = pd.to_datetime(uniques, format=fmt, errors="coerce")
+    failed = parsed.isna()
+    if failed.any():
+        values = parsed.to_numpy().copy()
+        values[failed] = pd.to_datetime(
+            uniques[failed].astype(str), format="mixed", dayfirst=True, errors="coerce"
+        ).to_numpy("datetime64[ns]")
+        parsed = pd.DatetimeIndex(values)
+    # в конец добавляется NaT, на него попадают коды -1 (пустые значения)
+    parsed = parsed.append(pd.DatetimeIndex([pd.NaT]))
+    values = parsed.to_numpy().take(categorical.cat.codes.to_numpy())
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def payment_dates(dates: pd.Series) -> pd.Series:
+    '''колонка "Дата платежа" в datetime64 (формат дд.мм.гггг)'''
+    return parse_dates(dates, PAYMENT_FORMAT)
+
+
+def add_date_parts(frame: pd.DataFrame) -> pd.DataFrame:
+    '''добавляет к фрейму с разобранной датой платежа год, месяц и номер дня'''
+    dates = frame[PAYMENT_DATE].to_numpy("datetime64[D]")
+    missing = np.isnat(dates)
+    days = dates.astype(np.int64)
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    frame[PAYMENT_YEAR] = np.where(missing, 0, years).astype(np.int16)
+    frame[PAYMENT_MONTH] = np.where(missing, 0, months).astype(np.int8)
+    frame[PAYMENT_DAY] = np.where(missing, -1, days).astype(np.int32)
+    return frame
+
+
+def date_parts(df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    '''год и месяц платежа: готовые колонки компактного фрейма или разбор на лету'''
+    if PAYMENT_YEAR in df.columns:
+        return df[PAYMENT_YEAR], df[PAYMENT_MONTH]
+    parts = add_date_parts(pd.DataFrame({PAYMENT_DATE: payment_dates(df[PAYMENT_DATE])}, index=df.index))
+    return parts[PAYMENT_YEAR], parts[PAYMENT_MONTH]
+
+
+_formatted: dict[tuple[str, int], str] = {}
+_formatted_lock = threading.Lock()
+
+
+def format_dates(dates: pd.Series, fmt: str = PAYMENT_FORMAT) -> list:
+    '''
+    даты в строки формата fmt списком, NaT - NaN
+
+    строки запоминаются по уникальной дате, так что повторные отчеты
+    берут их из словаря и не вызывают strftime
+    '''
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        return dates.tolist()
+    codes, uniques = pd.factorize(dates.to_numpy("datetime64[ns]"))
+    keys = uniques.astype(np.int64).tolist()
+    with _formatted_lock:
+        strings = [_formatted.get((fmt, key)) for key in keys]
+    missing = [i for i, text in enumerate(strings) if text is None]
+    if missing:
+        formatted = pd.DatetimeIndex(uniques[missing]).strftime(fmt).tolist()
+        with _formatted_lock:
+            if len(_formatted) > FORMATTED_CACHE_SIZE:
+                _formatted.clear()
+            for i, text in zip(missing, formatted):
+                strings[i] = text
+                _formatted[(fmt, keys[i])] = text
+    strings.append(np.nan)  # код -1 - пустая дата
+    return np.array(strings, dtype=object).take(codes).tolist()
+
+
+def compact_operations(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    компактная схема операций: category для текста (карты, категории, описания),
+    datetime64 для дат, год, месяц и номер дня платежа числами;
+    остальные колонки не копируются
+    '''
+    frame = df.copy(deep=False)
+    for name in TEXT_COLUMNS:
+        if name in frame.columns:
+            frame[name] = to_category(frame[name])
+    for name, fmt in DATE_COLUMNS.items():
+        if name in frame.columns:
+            frame[name] = parse_dates(frame[name], fmt)
+    if PAYMENT_DATE in frame.columns:
+        add_date_parts(frame)
+    return frame
+
+
+def align_categories(frame: pd.DataFrame, delta: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    '''приводит категории двух компактных фреймов к общему набору, чтобы concat не терял category'''
+    frame = frame.copy(deep=False)
+    delta = delta.copy(deep=False)
+    for name in frame.columns:
+        if not isinstance(frame[name].dtype, pd.CategoricalDtype) or name not in delta.columns:
+            continue
+        known = frame[name].cat.categories
+        incoming = to_category(delta[name])
+        added = incoming.cat.categories.difference(known)
+        if len(added):
+            frame[name] = frame[name].cat.add_categories(added)
+        delta[name] = incoming.cat.set_categories(frame[name].cat.categories)
+    return frame, delta
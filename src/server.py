@@ -0,0 +1,229 @@
+'''
+долгоживущий http-сервис поверх veb_json, spending_by_category и analize_category
+
+    python src/server.py --port 8080
+
+операции, индексы и пулы соединений прогреваются при старте и живут между запросами,
+ответы /spending и /categories кэшируются по версии данных (dataset.version),
+дашборд собирается из разделов views.dashboard_cache
+'''
+import argparse
+import asyncio
+import io
+import json
+import time
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import views
+from loader import Dataset
+from metrics import metrics
+from reports import get_logger, spending_by_category, write_frame_report
+from services import analize_category, category_index_for
+from store import store_for
+from utils import prepare_dashboard
+
+MAX_HEADER_LINES = 100
+
+
+class BadRequest(ValueError):
+    '''неверные параметры запроса, отдается 400'''
+
+
+class ResponseCache:
+    '''
+    готовые тела ответов по (версия данных, путь, параметры)
+
+    при смене версии старые ответы не нужны и кэш очищается целиком,
+    одновременные промахи по одному ключу считаются один раз
+    '''
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._version: int | None = None
+        self._items: dict[tuple, tuple[float, bytes]] = {}
+        self._pending: dict[tuple, asyncio.Future] = {}
+
+    async def get(self, version: int, key: tuple, ttl: float | None, build) -> bytes:
+        if version != self._version:
+            self._version = version
+            self._items.clear()
+        key = (version, *key)
+        item = self._items.get(key)
+        if item is not None and (item[0] is None or item[0] > self._clock()):
+            return item[1]
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            body = await asyncio.to_thread(build)
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()  # ошибка уже передана вызывающему, ожидающие получат ее через future
+            raise
+        else:
+            if version == self._version:
+                self._items[key] = (None if ttl is None else self._clock() + ttl, body)
+            future.set_result(body)
+        finally:
+            del self._pending[key]
+            if not future.done():
+                future.cancel()
+        return body
+
+
+def _param(params: dict[str, list[str]], name: str) -> str:
+    values = params.get(name)
+    if not values or not values[0]:
+        raise BadRequest(f"не указан параметр {name}")
+    return values[0]
+
+
+def _int_param(params: dict[str, list[str]], name: str) -> int:
+    value = _param(params, name)
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"параметр {name} должен быть числом: {value}") from None
+
+
+class DashboardApp:
+    '''
+    обработчики эндпоинтов:
+
+    /dashboard - ответ veb_json
+    /spending?category=...&date=дд.мм.гггг - траты по категории за 90 дней до даты
+    /categories?year=...&month=... - траты по категориям за месяц (analize_category)
+    '''
+
+    def __init__(self, data: Dataset | None = None):
+        self.data = data or views.dataset
+        self.cache = ResponseCache()
+        self.routes = {
+            "/dashboard": self.dashboard,
+            "/spending": self.spending,
+            "/categories": self.categories,
+        }
+
+    def warm_up(self) -> None:
+        '''читает операции и строит индексы всех эндпоинтов до первого запроса'''
+        operations = self.data.load()
+        prepare_dashboard(operations)
+        category_index_for(operations)
+        store_for(operations)
+        views.quote_fetcher.session  # requests и пул соединений - до первого запроса, а не в нем
+
+    async def dashboard(self, params: dict) -> bytes:
+        # у разделов дашборда свои сроки (views.dashboard_cache), весь ответ здесь не кэшируется
+        return await asyncio.to_thread(lambda: views.veb_json(data=self.data).encode())
+
+    async def spending(self, params: dict) -> bytes:
+        category = _param(params, "category")
+        try:
+            date = datetime.strptime(_param(params, "date"), "%d.%m.%Y")
+        except ValueError:
+            raise BadRequest("дата должна быть в формате дд.мм.гггг") from None
+
+        def build() -> bytes:
+            # отчет отдается в ответе, файл в reports/ на каждый запрос не пишется
+            result = spending_by_category.__wrapped__(self.data.load(), category, (date.day, date.month, date.year))
+            buffer = io.StringIO()
+            write_frame_report(buffer, result, compact=True)
+            return buffer.getvalue().encode()
+
+        return await self.cache.get(self.data.version, ("spending", category, date), None, build)
+
+    async def categories(self, params: dict) -> bytes:
+        year, month = _int_param(params, "year"), _int_param(params, "month")
+        if not 1 <= month <= 12:
+            raise BadRequest(f"неверный месяц: {month}")
+
+        def build() -> bytes:
+            result = analize_category(self.data.load(), year, month)
+            return json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode()
+
+        return await self.cache.get(self.data.version, ("categories", year, month), None, build)
+
+    async def respond(self, method: str, target: str) -> tuple[HTTPStatus, bytes]:
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, _error("неизвестный путь")
+        if method != "GET":
+            return HTTPStatus.METHOD_NOT_ALLOWED, _error("поддерживается только GET")
+        try:
+            with metrics.stage(f"server{url.path}"):
+                return HTTPStatus.OK, await handler(parse_qs(url.query))
+        except BadRequest as error:
+            return HTTPStatus.BAD_REQUEST, _error(str(error))
+        except Exception:
+            get_logger().exception("Ошибка при обработке запроса %s", target)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, _error("внутренняя ошибка")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        '''HTTP/1.1 с keep-alive: запросы одного соединения обрабатываются по очереди'''
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    status, body = HTTPStatus.BAD_REQUEST, _error("неверная строка запроса")
+                    method, version = "GET", "HTTP/1.0"
+                else:
+                    status, body = await self.respond(method, target)
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    if version == "HTTP/1.1"
+                    else headers.get("connection", "").lower() == "keep-alive"
+                )
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.Server:
+        '''прогревает данные и запускает сервер, возвращает asyncio.Server'''
+        await asyncio.to_thread(self.warm_up)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+def _error(message: str) -> bytes:
+    return json.dumps({"error": message}, ensure_ascii=False).encode()
+
+
+async def main(host: str, port: int) -> None:
+    server = await DashboardApp().serve(host, port)
+    print(f"🚀 Сервер запущен: http://{host}:{port}/dashboard")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="http-сервис дашборда и отчетов по операциям")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port))
@@ -3,29 +3,71 @@ import calendar
 import pandas as pd
 from dotenv import load_dotenv
 
+from loader import cached_for_frame, read_excel_file  # noqa: F401
+from memo import memoize
+from query import PAYMENTS, Filter, GroupSum, Query, execute
+from schema import PAYMENT_MONTH, PAYMENT_YEAR
+
 load_dotenv()
 
+CATEGORY_INDEX = "category_index"
+
+
+class CategoryIndex:
+    '''
+    траты по (год, месяц, категория), посчитанные за один проход
+
+    запрос за месяц - поиск в словаре, новые операции добавляются через append
+    '''
+
+    def __init__(self, df: pd.DataFrame | None = None):
+        self._months: dict[tuple[int, int], dict[str, float]] = {}
+        if df is not None:
+            self.append(df)
+
+    @staticmethod
+    def query() -> Query:
+        return Query(
+            GroupSum((PAYMENT_YEAR, PAYMENT_MONTH, "Категория"), ("Сумма платежа",)),
+            (PAYMENTS, Filter(PAYMENT_MONTH, "gt", 0)),
+        )
+
+    def append(self, df: pd.DataFrame) -> None:
+        '''добавляет новые операции, пересчитываются только затронутые месяцы'''
+        self.add(execute(df, self.query()))
+
+    def add(self, grouped: pd.DataFrame) -> None:
+        '''добавляет результат query()'''
+        changed = set()
+        for (year, month, category), amount in grouped["Сумма платежа"].items():
+            key = (int(year), int(month))
+            month_sums = self._months.setdefault(key, {})
+            month_sums[category] = month_sums.get(category, 0.0) + amount
+            changed.add(key)
+        for key in changed:
+            self._months[key] = dict(sorted(self._months[key].items()))
+
+    def spend(self, year: int, month: int, category: str) -> float:
+        '''сумма трат (по модулю) по категории за месяц'''
+        return abs(self._months.get((year, month), {}).get(category, 0.0))
+
+    def month(self, year: int, month: int) -> dict[str, int]:
+        '''траты по всем категориям за месяц в формате analize_category'''
+        return {
+            category: int(abs(amount) / 100)
+            for category, amount in self._months.get((year, month), {}).items()
+        }
+
 
-def read_excel_file(road_to_excel_file: str):
-    """возврощает excel файлы в ввиде словоря"""
-    df = pd.read_excel(road_to_excel_file)
-    return df
+def category_index_for(df: pd.DataFrame) -> CategoryIndex:
+    '''индекс для дата-фрейма, строится при первом обращении'''
+    return cached_for_frame(df, CATEGORY_INDEX, CategoryIndex)
 
 
+@memoize()
 def analize_category(df, year: int, month: int):
     '''
     выводит все платежи по выбранной категории, за указанный месяц
     '''
-    end_date = calendar.monthrange(year, month)[1]
-    df["Дата платежа"] = pd.to_datetime(df["Дата платежа"], dayfirst=True)
-    filtr = df.loc[df["Дата платежа"] >= f"{year}-{month}-01"].loc[
-        df["Дата платежа"] <= f"{year}-{month}-{end_date}"
-    ]
-    filtr_of_pay = filtr[filtr["Сумма платежа"] < 0]
-    filtr_of_cat = filtr_of_pay.groupby("Категория")
-    sum_of_cat = filtr_of_cat["Сумма платежа"].sum().abs()
-    sum_of_cat_dict = sum_of_cat.to_dict()
-    result = {}
-    for key, value in sum_of_cat_dict.items():
-        result[key] = int(value / 100)
-    return result
+    calendar.monthrange(year, month)  # проверка года и месяца, как и раньше
+    return category_index_for(df).month(year, month)
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from loader import cached_for_frame
+from schema import align_categories, payment_dates
+
+
+class OperationsStore:
+    '''
+    операции, разложенные по категориям и отсортированные по дате платежа
+
+    хранит поверхностную копию фрейма с уже разобранными датами (свой только столбец дат,
+    остальные колонки общие с исходным фреймом); для каждой категории -
+    массив дат datetime64 и позиции строк расходов (сумма < 0) в том же порядке,
+    поэтому выборка за период - два searchsorted и срез
+    '''
+
+    def __init__(self, df: pd.DataFrame):
+        self.frame = self._parse(df)
+        self._partitions: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._build_partitions(np.arange(len(self.frame)))
+
+    @staticmethod
+    def _parse(df: pd.DataFrame) -> pd.DataFrame:
+        '''поверхностная копия: заменяется только колонка дат, остальные колонки общие с df'''
+        frame = df.copy(deep=False)
+        frame["Дата платежа"] = payment_dates(frame["Дата платежа"])
+        return frame
+
+    def append(self, delta: pd.DataFrame) -> None:
+        '''дописывает новые строки в собственный фрейм; пересобираются только партиции их категорий'''
+        frame, delta = align_categories(self.frame, delta)
+        self.follow(pd.concat([frame, delta], ignore_index=True), delta)
+
+    def follow(self, frame: pd.DataFrame, delta: pd.DataFrame) -> None:
+        '''
+        переходит на frame - тот же фрейм, дописанный строками delta в конец;
+        строки не копируются, заново разбираются только даты delta
+        '''
+        start = len(self.frame)
+        dates = pd.concat([self.frame["Дата платежа"], payment_dates(delta["Дата платежа"])], ignore_index=True)
+        self.frame = frame.copy(deep=False)
+        self.frame["Дата платежа"] = dates.to_numpy("datetime64[ns]")
+        self._build_partitions(np.arange(start, len(self.frame)))
+
+    def _build_partitions(self, positions: np.ndarray) -> None:
+        '''раскладывает строки с позициями positions по категориям'''
+        dates = self.frame["Дата платежа"].to_numpy("datetime64[ns]")
+        pay = (
+            (self.frame["Сумма платежа"].to_numpy()[positions] < 0)
+            & ~np.isnat(dates[positions])
+            & self.frame["Категория"].notna().to_numpy()[positions]
+        )
+        positions = positions[pay]
+        codes, categories = pd.factorize(self.frame["Категория"].to_numpy()[positions])
+        order = np.lexsort((dates[positions], codes))
+        positions, codes = positions[order], codes[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        for start, chunk in zip(starts, np.split(positions, bounds)):
+            if not len(chunk):
+                continue
+            category = categories[codes[start]]
+            if category in self._partitions:
+                # новые строки вставляются в уже отсортированную партицию
+                old_dates, old_positions = self._partitions[category]
+                where = np.searchsorted(old_dates, dates[chunk], side="right")
+                self._partitions[category] = (
+                    np.insert(old_dates, where, dates[chunk]),
+                    np.insert(old_positions, where, chunk),
+                )
+            else:
+                self._partitions[category] = (dates[chunk], chunk)
+
+    @property
+    def categories(self) -> list[str]:
+        return list(self._partitions)
+
+    def window(self, category: str, start: datetime, end: datetime) -> np.ndarray:
+        '''позиции расходов категории с датой в [start, end], по возрастанию даты'''
+        partition = self._partitions.get(category)
+        if partition is None:
+            return np.empty(0, dtype=np.intp)
+        dates, positions = partition
+        lo = np.searchsorted(dates, np.datetime64(start, "ns"), side="left")
+        hi = np.searchsorted(dates, np.datetime64(end, "ns"), side="right")
+        return positions[lo:hi]
+
+    def windows(self, categories: list[str], starts: list[datetime], ends: list[datetime]) -> list[np.ndarray]:
+        '''
+        позиции для многих окон сразу: запросы группируются по категории,
+        и для каждой категории все границы ищутся одним searchsorted
+        '''
+        result = [np.empty(0, dtype=np.intp)] * len(categories)
+        starts_ = np.asarray(starts, dtype="datetime64[ns]")
+        ends_ = np.asarray(ends, dtype="datetime64[ns]")
+        codes, uniques = pd.factorize(np.asarray(categories, dtype=object))
+        for code, category in enumerate(uniques):
+            partition = self._partitions.get(category)
+            if partition is None:
+                continue
+            dates, positions = partition
+            queries = np.flatnonzero(codes == code)
+            lo = np.searchsorted(dates, starts_[queries], side="left")
+            hi = np.searchsorted(dates, ends_[queries], side="right")
+            for i, start, end in zip(queries, lo, hi):
+                result[i] = positions[start:end]
+        return result
+
+    def rows(self, positions: np.ndarray) -> pd.DataFrame:
+        '''строки фрейма по позициям, в исходном порядке строк'''
+        return self.frame.take(np.sort(positions))
+
+
+def store_for(df: pd.DataFrame) -> OperationsStore:
+    '''хранилище для дата-фрейма, строится при первом обращении'''
+    return cached_for_frame(df, "operations_store", OperationsStore)
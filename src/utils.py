@@ -1,12 +1,16 @@
 import datetime
+import heapq
 import json
-import os
-#import finnhub  # type: ignore
-import pandas as pd
-import requests
+from functools import lru_cache
 
+import pandas as pd
 from dotenv import load_dotenv
 
+from loader import SETTINGS_PATH, cached_for_frame, dataset, read_excel_file  # noqa: F401
+from query import PAYMENTS, GroupSum, Query, Top, execute, period
+from quotes import quote_fetcher
+from schema import format_dates
+
 load_dotenv()
 
 
@@ -25,82 +29,209 @@ def greetings():
     return greeting
 
 
-def read_excel_file(road_to_excel_file: str):
-    """возврощает excel файлы в ввиде словоря"""
-    df = pd.read_excel(road_to_excel_file)
-    return df
+CASHBACK = "Начисленный кэшбэк"
+
+
+class CardSummary:
+    '''
+    сводка по картам: сколько потрачено, кэшбэк и число операций
+
+    считается колонками за один groupby, новые операции дописываются через append;
+    cashback_percent - процент кэшбэка по категориям, для остальных default_percent
+    '''
+
+    def __init__(
+        self,
+        operations: pd.DataFrame | None = None,
+        cashback_percent: dict[str, float] | None = None,
+        default_percent: float = 1.0,
+    ):
+        self.cashback_percent = dict(cashback_percent or {})
+        self.default_percent = default_percent
+        self._totals = pd.DataFrame({"spent": [], "cashback": [], "count": []}, dtype=float)
+        if operations is not None:
+            self.append(operations)
+
+    def _cashback(self, operations: pd.DataFrame) -> pd.Series:
+        amounts = operations["Сумма платежа"]
+        if self.cashback_percent:
+            percent = operations["Категория"].map(self.cashback_percent).astype(float).fillna(self.default_percent)
+            return amounts * percent
+        return amounts * self.default_percent
+
+    def query(self) -> Query:
+        '''запрос для query.execute, колонка кэшбэка - из columns()'''
+        return Query(GroupSum(("Номер карты",), ("Сумма платежа", CASHBACK), count=True, sort=False), (PAYMENTS,))
+
+    def columns(self) -> dict:
+        return {CASHBACK: self._cashback}
+
+    def add(self, grouped: pd.DataFrame) -> None:
+        '''добавляет в сводку результат query()'''
+        totals = pd.DataFrame({
+            "spent": grouped["Сумма платежа"],
+            "cashback": grouped[CASHBACK],
+            "count": grouped["count"].astype(float),
+        })
+        totals.index = totals.index.astype(object)
+        self._totals = totals if self._totals.empty else self._totals.add(totals, fill_value=0)
+
+    def append(self, operations: pd.DataFrame) -> None:
+        '''добавляет операции в сводку'''
+        self.add(execute(operations, self.query(), self.columns()))
+
+    def records(self, with_counts: bool = False) -> list[dict]:
+        '''карты по возрастанию трат в формате all_cards'''
+        totals = self._totals.abs().sort_values("spent", kind="stable")
+        cards = totals.index.tolist()
+        spent = totals["spent"].tolist()
+        cashback = (totals["cashback"] / 100).tolist()
+        if not with_counts:
+            return [
+                {"last_digits": card, "total_spent": total, "cashback": bonus}
+                for card, total, bonus in zip(cards, spent, cashback)
+            ]
+        counts = totals["count"].astype(int).tolist()
+        return [
+            {"last_digits": card, "total_spent": total, "cashback": bonus, "operations": count}
+            for card, total, bonus, count in zip(cards, spent, cashback, counts)
+        ]
+
+
+def all_cards(operations: pd.DataFrame, cashback_percent: dict[str, float] | None = None) -> list[dict]:
+    '''выводит все номера карт имеющиеся в дата-фрейме(operations)'''
+    key = _summary_key(cashback_percent)
+    summary = cached_for_frame(operations, key, lambda df: CardSummary(df, cashback_percent))
+    return summary.records()
 
 
-operations = read_excel_file(r"../data/operations.xlsx")
+def _summary_key(cashback_percent: dict[str, float] | None) -> str:
+    return f"card_summary_{sorted((cashback_percent or {}).items())}"
 
 
-def all_cards(operations: pd.DataFrame) -> list[dict]:
-    '''выводит все номера карт имеющиеся в дата-фрейме(operations)'''
-    list_ = []
-    operations_sort = operations[operations["Сумма платежа"] < 0]
-    operations_sort_by_group = (
-        operations_sort.groupby(["Номер карты"]).agg({"Сумма платежа": "sum"}).abs()
-    )
-    operations_sort_by_value = operations_sort_by_group.sort_values(
-        by=["Сумма платежа"], ascending=True
-    )
-    for i, some_price in operations_sort_by_value.iterrows():
-        list_.append(
-            {
-                "last_digits": i,
-                "total_spent": float(some_price["Сумма платежа"]),
-                "cashback": float(some_price["Сумма платежа"] / 100),
-            }
-        )
-    return list_
-
-
-def top_transactions(operations: pd.DataFrame) -> list[dict]:
-    '''выводит самые большие транзакции в переданном дата-фрейме'''
-    list_ = []
-    operations_sort = operations.sort_values("Сумма платежа")
-    head_operations = operations_sort[:5].to_dict(orient="records")
-    for i in head_operations:
-        list_.append(
-            {
-                "date": i["Дата платежа"],
-                "amount": i["Сумма платежа"] * -1,
-                "category": i["Категория"],
-                "description": i["Описание"],
-            }
-        )
-    return list_
+GROUP_COLUMNS = {"card": "Номер карты", "category": "Категория"}
 
 
-with open("../data/user_settings.json", "r", encoding="utf-8") as file:
-    data_ = json.load(file)
-
-values_to_request = ", ".join(data_["user_currencies"])
-values_stocks_to_request = data_["user_stocks"]
+def _transactions(rows: pd.DataFrame) -> list[dict]:
+    '''переводит строки операций в формат top_transactions'''
+    return [
+        {"date": date, "amount": amount * -1, "category": category, "description": description}
+        for date, amount, category, description in zip(
+            format_dates(rows["Дата платежа"]),
+            rows["Сумма платежа"].tolist(),
+            rows["Категория"].tolist(),
+            rows["Описание"].tolist(),
+        )
+    ]
+
+
+class RunningTop:
+    '''
+    n самых крупных трат, которые обновляются по мере поступления операций
+
+    хранит кучу из n строк, новые операции не требуют пересортировки истории
+    '''
+
+    def __init__(self, n: int = 5, operations: pd.DataFrame | None = None):
+        self.n = n
+        self._heap: list[tuple[float, int, dict]] = []
+        self._seq = 0
+        if operations is not None:
+            self.append(operations)
+
+    def query(self) -> Query:
+        return Query(Top(self.n))
+
+    def append(self, operations: pd.DataFrame) -> None:
+        '''добавляет операции; в кучу попадают только n лучших кандидатов из них'''
+        # метки индекса могут повторяться (concat без ignore_index), кандидаты ищутся по позициям
+        rows = operations.copy(deep=False)
+        rows.index = pd.RangeIndex(len(rows))
+        self.add(rows, execute(rows, self.query()))
+
+    def add(self, operations: pd.DataFrame, candidates: pd.DataFrame) -> None:
+        '''добавляет кандидатов - результат query() по операциям operations'''
+        positions = operations.index.get_indexer(candidates.index) + self._seq
+        self._seq += len(operations)
+        for seq, amount, record in zip(positions, candidates["Сумма платежа"].tolist(), _transactions(candidates)):
+            # корень кучи - самая маленькая трата, при равенстве - самая поздняя строка
+            item = (-amount, -int(seq), record)
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+
+    def top(self) -> list[dict]:
+        return [record for _, _, record in sorted(self._heap, reverse=True)]
+
+
+def top_transactions(
+    operations: pd.DataFrame,
+    n: int = 5,
+    by: str | None = None,
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+) -> list[dict] | dict[str, list[dict]]:
+    '''
+    выводит самые большие транзакции в переданном дата-фрейме
+
+    n: сколько транзакций вернуть
+    by: "card" или "category" - топ отдельно для каждой карты или категории
+    start, end: учитывать только платежи в этом периоде
+    '''
+    if by is None and start is None and end is None:
+        return cached_for_frame(operations, f"running_top_{n}", lambda df: RunningTop(n, df)).top()
+
+    where = period(start, end) if start is not None or end is not None else ()
+    column = GROUP_COLUMNS[by] if by is not None else None
+    rows = execute(operations, Query(Top(n, column), where))
+    if by is None:
+        return _transactions(rows)
+    return {
+        group: _transactions(group_rows)
+        for group, group_rows in rows.groupby(column, sort=False, observed=True)
+    }
+
+
+def prepare_dashboard(operations: pd.DataFrame, n: int = 5) -> None:
+    '''строит сводку по картам и топ-n заранее, чтобы первый запрос дашборда их не ждал'''
+    all_cards(operations)
+    top_transactions(operations, n)
+
+
+@lru_cache(maxsize=None)
+def user_settings() -> dict:
+    '''читает настройки пользователя при первом обращении'''
+    with open(SETTINGS_PATH, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def currencies_to_request() -> str:
+    '''валюты из настроек пользователя в виде строки для запроса'''
+    return ", ".join(user_settings()["user_currencies"])
+
+
+def stocks_to_request() -> list[str]:
+    '''акции из настроек пользователя'''
+    return user_settings()["user_stocks"]
+
+
+def __getattr__(name: str):
+    # старые имена модуля, теперь вычисляются лениво
+    if name == "operations":
+        return dataset.load()
+    if name == "values_to_request":
+        return currencies_to_request()
+    if name == "values_stocks_to_request":
+        return stocks_to_request()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def currency_of_valuets(symbols: str) -> list[dict]:
     '''выдает курс валют к рублю в настоящие время'''
-    base = "RUB"
-    url = f"https://api.apilayer.com/exchangerates_data/latest?symbols={symbols}&base={base}"
-
-    headers = {"apikey": os.getenv("SAFE_API_LAYER_KEY")}
+    return quote_fetcher.currency_rates(symbols)
 
-    currency_rates = []
 
-    response = requests.get(url, headers=headers, data={})
-    print(response.status_code)
-    for key, value in response.json().get("rates").items():
-        currency_rates.append({"currency": key, "rate": round(1 / value, 2)})
-    return currency_rates
-
-
-def currency_stoks(stocks: str) -> list[dict]:
+def currency_stoks(stocks: list[str]) -> list[dict]:
     '''выдает курс заданных акций в настоящие время'''
-    finnhub_client = finnhub.Client(api_key=os.getenv("API_FINNHUB"))
-
-    resalt_stock = []
-    for i in stocks:
-        quote = finnhub_client.quote(i)
-        resalt_stock.append({"stock": i, "price": quote["c"]})
-    return resalt_stock
+    return quote_fetcher.stock_prices(stocks)
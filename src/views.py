@@ -1,33 +1,140 @@
+import argparse
 import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Hashable
 
+from loader import Dataset, dataset, frame_fingerprint
+from metrics import metrics
+from quotes import quote_fetcher
 from utils import (all_cards,
-                   currency_of_valuets,
-                   currency_stoks,
+                   currencies_to_request,
                    greetings,
-                   operations,
-                   top_transactions,
-                   values_stocks_to_request,
-                   values_to_request)
-
-
-def veb_json() -> str:
-    '''собирает функции из модуля utils.py и возвращает их в виде еденного json ответ'''
-    greeting_ = greetings()
-    cards = all_cards(operations)
-    top_transactions_ = top_transactions(operations)
-    currency_of_valuets_ = currency_of_valuets(values_to_request)
-    currency_stoks_ = currency_stoks(values_stocks_to_request)
-
-    final_report = {
-        "greeting": greeting_,
-        "cards": cards,
-        "top_transactions": top_transactions_,
-        "currency_of_valuets": currency_of_valuets_,
-        "currency_stoks": currency_stoks_,
+                   stocks_to_request,
+                   top_transactions)
+
+# сколько живут разделы с курсами и ценами акций, как и кэш QuoteFetcher
+QUOTES_TTL = 60.0
+
+
+class DashboardCache:
+    '''
+    разделы ответа veb_json, уже сериализованные в json-фрагменты
+
+    у каждого раздела свой ключ актуальности (версия данных, час, набор котировок)
+    и, при необходимости, срок жизни; ответ склеивается из готовых фрагментов
+    '''
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._sections: dict[str, tuple[Hashable, float | None, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, key: Hashable) -> str | None:
+        with self._lock:
+            item = self._sections.get(name)
+        if item is None or item[0] != key or (item[1] is not None and item[1] <= self._clock()):
+            return None
+        return item[2]
+
+    def set(self, name: str, key: Hashable, value: Any, ttl: float | None = None) -> str:
+        '''сериализует раздел так, как его записал бы json.dumps всего ответа с indent=4'''
+        fragment = _fragment(value)
+        expires = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            self._sections[name] = (key, expires, fragment)
+        return fragment
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sections.clear()
+
+
+def _fragment(value: Any) -> str:
+    # в строках json переводов строк нет, поэтому сдвиг вложенного уровня - замена "\n"
+    return json.dumps(value, indent=4).replace("\n", "\n    ")
+
+
+def _splice(fragments: dict[str, str]) -> str:
+    '''собирает ответ из фрагментов, результат совпадает с json.dumps(..., indent=4)'''
+    body = ",\n".join(f"    {json.dumps(name)}: {fragment}" for name, fragment in fragments.items())
+    return "{\n" + body + "\n}"
+
+
+dashboard_cache = DashboardCache()
+
+
+def veb_json(debug: bool = False, data: Dataset | None = None) -> str:
+    '''
+    собирает функции из модуля utils.py и возвращает их в виде еденного json ответ
+
+    разделы берутся из dashboard_cache: данные - пока не изменились операции,
+    приветствие - в пределах часа, котировки - QUOTES_TTL секунд
+    debug: добавить в ответ время, строки и память по каждому этапу
+    data: чьи операции показывать, по умолчанию - общий dataset
+    '''
+    runs = []
+    # сам объект, а не id: ключ держит ссылку, и id подмененного fetcher не достанется новому
+    quotes_key = (quote_fetcher, currencies_to_request(), tuple(stocks_to_request()))
+    rates_fragment = dashboard_cache.get("currency_of_valuets", quotes_key)
+    stocks_fragment = dashboard_cache.get("currency_stoks", quotes_key)
+    if rates_fragment is None or stocks_fragment is None:
+        # внешние запросы уходят сразу и идут параллельно с локальными расчетами
+        rates_future, stock_futures = quote_fetcher.submit_all(quotes_key[1], list(quotes_key[2]))
+    with metrics.stage("load") as run:
+        operations = (data or dataset).load()
+        data_key = frame_fingerprint(operations)
+        cards_fragment = dashboard_cache.get("cards", data_key)
+        top_fragment = dashboard_cache.get("top_transactions", data_key)
+        run.rows = len(operations)
+    runs.append(run)
+    with metrics.stage("greetings") as run:
+        hour = datetime.now().strftime("%Y-%m-%d %H")
+        greeting_fragment = dashboard_cache.get("greeting", hour)
+        if greeting_fragment is None:
+            greeting_fragment = dashboard_cache.set("greeting", hour, greetings())
+    runs.append(run)
+    with metrics.stage("all_cards", rows=len(operations)) as run:
+        if cards_fragment is None:
+            cards_fragment = dashboard_cache.set("cards", data_key, all_cards(operations))
+    runs.append(run)
+    with metrics.stage("top_transactions", rows=len(operations)) as run:
+        if top_fragment is None:
+            top_fragment = dashboard_cache.set("top_transactions", data_key, top_transactions(operations))
+    runs.append(run)
+    with metrics.stage("currency_of_valuets") as run:
+        if rates_fragment is None:
+            rates_fragment = dashboard_cache.set(
+                "currency_of_valuets", quotes_key, rates_future.result(), QUOTES_TTL
+            )
+    runs.append(run)
+    with metrics.stage("currency_stoks") as run:
+        if stocks_fragment is None:
+            stocks_fragment = dashboard_cache.set(
+                "currency_stoks", quotes_key, [future.result() for future in stock_futures], QUOTES_TTL
+            )
+    runs.append(run)
+
+    fragments = {
+        "greeting": greeting_fragment,
+        "cards": cards_fragment,
+        "top_transactions": top_fragment,
+        "currency_of_valuets": rates_fragment,
+        "currency_stoks": stocks_fragment,
     }
-    return json.dumps(final_report, indent=4)
+    if debug:
+        fragments["debug"] = _fragment({"stages": {run.name: run.as_dict() for run in runs}})
+    return _splice(fragments)
 
 
 if __name__ == "__main__":
-    print(veb_json())
-
+    parser = argparse.ArgumentParser(description="дашборд по операциям в виде json")
+    parser.add_argument("--debug", action="store_true", help="добавить в ответ замеры по этапам")
+    parser.add_argument("--metrics", help="записать замеры в файл в формате Prometheus")
+    args = parser.parse_args()
+    if args.debug:
+        metrics.trace_memory()
+    print(veb_json(debug=args.debug))
+    if args.metrics:
+        metrics.write_prometheus(args.metrics)
@@ -0,0 +1,24 @@
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+
+import pytest
+
+import views
+
+
+def done(value):
+    '''уже завершенный Future с результатом value'''
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+@pytest.fixture
+def fake_quotes(monkeypatch):
+    '''quote_fetcher в views без сети: submit_all сразу отдает курс USD и цену AAPL'''
+    quotes = MagicMock()
+    quotes.submit_all.side_effect = lambda *args: (
+        done([{"currency": "USD", "rate": 90.91}]), [done({"stock": "AAPL", "price": 175.5})]
+    )
+    monkeypatch.setattr(views, "quote_fetcher", quotes)
+    return quotes
@@ -0,0 +1,79 @@
+import json
+
+import pandas as pd
+
+import batch
+from batch import analyze_operations, run_batch, run_shared
+
+
+def make_export(path, card):
+    df = pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.02.2023", "10.03.2023"],
+        "Номер карты": [card, card, card],
+        "Сумма платежа": [-1000.0, -500.0, -300.0],
+        "Категория": ["Food", "Food", "Taxi"],
+        "Описание": ["Shop", "Shop", "Taxi"],
+    })
+    df.to_excel(path, index=False)
+    return df
+
+
+def test_run_batch_writes_report_per_export(tmp_path):
+    """Каждая выгрузка считается в своем процессе и пишет свой отчет"""
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    first = make_export(exports / "client_1.xlsx", "*1111")
+    make_export(exports / "client_2.xlsx", "*2222")
+
+    results = run_batch(exports, tmp_path / "out", workers=2)
+
+    assert [item["rows"] for item in results] == [3, 3]
+    with open(tmp_path / "out" / "client_1.json", encoding="utf-8") as f:
+        report = json.load(f)
+    assert report == json.loads(json.dumps(analyze_operations(first)))
+    assert report["categories_by_month"]["2023-01"] == {"Food": 10}
+    assert report["spending_90_days"] == [
+        {"category": "Food", "total_sum": 1500.0, "operations": 2},
+        {"category": "Taxi", "total_sum": 300.0, "operations": 1},
+    ]
+
+
+def test_run_shared_splits_one_export_by_card(tmp_path):
+    """Общая выгрузка делится по картам, воркеры читают один колоночный кэш"""
+    source = tmp_path / "operations.xlsx"
+    first = make_export(tmp_path / "first.xlsx", "*1111")
+    second = make_export(tmp_path / "second.xlsx", "*2222").iloc[:2]
+    pd.concat([first, second], ignore_index=True).to_excel(source, index=False)
+
+    results = run_shared(source, tmp_path / "out", workers=2)
+
+    assert [item["rows"] for item in results] == [3, 2]
+    for name, part in (("operations_1111.json", first), ("operations_2222.json", second)):
+        with open(tmp_path / "out" / name, encoding="utf-8") as f:
+            assert json.load(f) == json.loads(json.dumps(analyze_operations(part.reset_index(drop=True))))
+
+
+def test_analyze_operations_builds_category_index_once(monkeypatch):
+    """Индекс по месяцам строится один раз на выгрузку, а не на каждый месяц"""
+    built = []
+
+    class CountingIndex(batch.CategoryIndex):
+        def __init__(self, df=None):
+            built.append(len(df))
+            super().__init__(df)
+
+    monkeypatch.setattr(batch, "CategoryIndex", CountingIndex)
+    df = pd.DataFrame({
+        "Дата платежа": [f"15.{month:02d}.2023" for month in range(1, 13)],
+        "Номер карты": ["*1111"] * 12,
+        "Сумма платежа": [-100.0 * month for month in range(1, 13)],
+        "Категория": ["Food"] * 12,
+        "Описание": ["Shop"] * 12,
+    })
+
+    report = analyze_operations(df)
+
+    assert built == [12]
+    assert len(report["categories_by_month"]) == 12
+    assert report["categories_by_month"]["2023-03"] == {"Food": 3}
+    print("✅ Индекс категорий построен один раз")
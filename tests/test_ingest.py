@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from ingest import ingest, iter_operation_chunks
+from services import analize_category
+from utils import all_cards, top_transactions
+
+
+def make_operations():
+    return pd.DataFrame({
+        "Дата операции": [f"{day:02d}.01.2023 12:00:00" for day in range(1, 8)],
+        "Дата платежа": [f"{day:02d}.01.2023" for day in range(1, 8)],
+        "Номер карты": ["*1234", "*5678", None, "*1234", "*5678", "*1234", "*9999"],
+        "Сумма платежа": [-100.0, -250.5, -40.0, 500.0, -1000.0, -75.25, -10.0],
+        "Категория": ["Food", "Taxi", "Food", "Salary", "Travel", "Food", "Taxi"],
+        "Описание": ["Shop", "Taxi", "Cafe", "Salary", "Hotel", "Shop", "Taxi"],
+        "Бонусы (включая кэшбэк)": [1, 2, 0, 0, 10, 0, 0],
+    })
+
+
+@pytest.mark.parametrize("suffix", [".xlsx", ".csv"])
+def test_ingest_matches_full_load(tmp_path, suffix):
+    """Агрегаты по пачкам совпадают с расчетом по целому файлу"""
+    df = make_operations()
+    source = tmp_path / f"operations{suffix}"
+    if suffix == ".csv":
+        df.to_csv(source, index=False)
+    else:
+        df.to_excel(source, index=False)
+
+    chunks = list(iter_operation_chunks(source, chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert chunks[-1].index.tolist() == [6]
+
+    result = ingest(source, chunk_size=3, n=3)
+    assert result.rows == len(df)
+    assert result.all_cards() == all_cards(df)
+    assert result.top_transactions() == top_transactions(df, n=3)
+    assert result.analize_category(2023, 1) == analize_category(df, 2023, 1)
+    print(f"✅ Потоковое чтение {suffix} совпадает с полной загрузкой")
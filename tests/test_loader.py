@@ -0,0 +1,214 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import loader
+
+
+def make_excel(path):
+    df = pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.01.2023", None],
+        "Номер карты": ["*1234", None, "*1234"],
+        "Сумма платежа": [-1000.5, -500.0, 300.0],
+        "Категория": ["Food", "Food", "Transport"],
+        "Бонусы (включая кэшбэк)": [10, 5, 0],
+    })
+    df.to_excel(path, index=False)
+    return df
+
+
+def test_cache_roundtrip(tmp_path, monkeypatch):
+    """Второе чтение берется из кэша и совпадает с первым"""
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+
+    first = loader.read_excel_file(source)
+    assert (loader.cache_dir_for(source) / "meta.json").exists()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("xlsx не должен разбираться повторно")
+
+    monkeypatch.setattr(pd, "read_excel", fail)
+    second = loader.read_excel_file(source)
+
+    pd.testing.assert_frame_equal(first, second)
+    print("✅ кэш: OK")
+
+
+def test_cache_columns_are_memory_mapped(tmp_path):
+    """Колонки кэша отдаются как memmap"""
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    loader.read_excel_file(source)
+
+    columns = loader.load_columns(source)
+    assert isinstance(columns["Сумма платежа"], np.memmap)
+    assert list(columns["Номер карты"]) == [0, -1, 0]
+
+
+def test_cache_invalidated_on_change(tmp_path):
+    """Изменение исходного файла перестраивает кэш"""
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    loader.read_excel_file(source)
+
+    changed = pd.DataFrame({"Сумма платежа": [-1.0], "Категория": ["Taxi"]})
+    changed.to_excel(source, index=False)
+    assert loader.load_columns(source) is None
+
+    result = loader.read_excel_file(source)
+    assert list(result["Категория"]) == ["Taxi"]
+
+
+def test_cache_survives_touch(tmp_path):
+    """Смена mtime без изменения содержимого не сбрасывает кэш"""
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    loader.read_excel_file(source)
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert loader.load_columns(source) is not None
+
+
+def test_dataset_loads_once(tmp_path, monkeypatch):
+    """Dataset читает файл только при первом load() и заново при reload()"""
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    calls = []
+    original = loader.read_excel_file
+
+    def counting(path, **kwargs):
+        calls.append(path)
+        return original(path, **kwargs)
+
+    monkeypatch.setattr(loader, "read_excel_file", counting)
+    dataset = loader.Dataset(source)
+    assert not dataset.loaded
+    assert calls == []
+
+    first = dataset.load()
+    assert dataset.load() is first
+    assert len(calls) == 1
+    assert dataset.version == 1
+
+    dataset.reload()
+    assert len(calls) == 2
+    assert dataset.version == 2
+
+
+def test_dataset_append_skips_known_operations(tmp_path):
+    """append дописывает только новые операции и переносит индекс без пересборки"""
+    from services import analize_category, category_index_for
+
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    dataset = loader.Dataset(source)
+    first = dataset.load()
+    index = category_index_for(first)
+
+    export = pd.concat([first, pd.DataFrame({
+        "Дата платежа": ["21.01.2023", "21.01.2023"],
+        "Номер карты": ["*1234", "*1234"],
+        "Сумма платежа": [-200.0, -200.0],
+        "Категория": ["Food", "Food"],
+        "Бонусы (включая кэшбэк)": [1, 1],
+    })], ignore_index=True)
+    added = dataset.append(export, full_export=True)
+
+    assert len(added) == 2  # одинаковые покупки в выгрузке - разные операции
+    assert len(dataset.load()) == 5
+    assert dataset.version == 2
+    assert category_index_for(dataset.load()) is index
+    assert analize_category(dataset.load(), 2023, 1) == {"Food": 19}
+
+    assert dataset.append(export, full_export=True).empty
+    assert dataset.version == 2
+
+
+def test_dataset_append_delta_keeps_repeated_purchase(tmp_path):
+    """В файле только новых операций покупка, совпадающая с прошлой, не отсеивается"""
+    source = tmp_path / "operations.xlsx"
+    purchase = pd.DataFrame({
+        "Дата операции": ["21.01.2023 12:00:00"],
+        "Номер карты": ["*1234"],
+        "Сумма операции": [-200.0],
+        "Описание": ["Кофе"],
+    })
+    dataset = loader.Dataset(source)
+    dataset.set_frame(purchase.copy())
+
+    assert len(dataset.append(purchase.copy(), full_export=False)) == 1
+    assert len(dataset.load()) == 2
+    # полная выгрузка с теми же двумя покупками ничего не добавляет, с третьей - добавляет одну
+    assert dataset.append(pd.concat([purchase] * 2, ignore_index=True), full_export=True).empty
+    assert len(dataset.append(pd.concat([purchase] * 3, ignore_index=True), full_export=True)) == 1
+    assert len(dataset.load()) == 3
+
+
+def test_compact_dataset_append(tmp_path):
+    """Компактный Dataset хранит category и даты, append сохраняет схему"""
+    from services import analize_category
+
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    dataset = loader.Dataset(source, compact=True)
+    first = dataset.load()
+    assert isinstance(first["Категория"].dtype, pd.CategoricalDtype)
+    assert str(first["Дата платежа"].dtype) == "datetime64[ns]"
+
+    dataset.append(pd.DataFrame({
+        "Дата платежа": ["21.01.2023"],
+        "Номер карты": ["*9999"],
+        "Сумма платежа": [-200.0],
+        "Категория": ["Cafe"],
+        "Бонусы (включая кэшбэк)": [1],
+    }), full_export=False)
+    frame = dataset.load()
+    assert isinstance(frame["Категория"].dtype, pd.CategoricalDtype)
+    assert analize_category(frame, 2023, 1) == {"Cafe": 2, "Food": 15}
+
+
+def test_caller_frames_are_not_cached(tmp_path):
+    """Фрейм вызывающего могут изменить на месте: индексы для него не кэшируются"""
+    from services import analize_category, category_index_for
+
+    df = pd.DataFrame({
+        "Дата платежа": ["15.01.2023"],
+        "Сумма платежа": [-1000.0],
+        "Категория": ["A"],
+    })
+    assert analize_category(df, 2023, 1) == {"A": 10}
+    df.loc[0, "Сумма платежа"] = -5000.0
+    assert analize_category(df, 2023, 1) == {"A": 50}
+    assert category_index_for(df) is not category_index_for(df)
+
+    dataset = loader.Dataset(tmp_path / "operations.xlsx")
+    dataset.set_frame(df)
+    assert loader.is_owned(df)
+    assert category_index_for(df) is category_index_for(df)
+
+
+def test_store_follows_appended_frame(tmp_path):
+    """После append хранилище окон читает строки из нового фрейма Dataset, а не из своей копии"""
+    from reports import spending_by_category
+    from store import store_for
+
+    source = tmp_path / "operations.xlsx"
+    make_excel(source)
+    dataset = loader.Dataset(source)
+    store = store_for(dataset.load())
+
+    dataset.append(pd.DataFrame({
+        "Дата платежа": ["21.01.2023"],
+        "Номер карты": ["*9999"],
+        "Сумма платежа": [-200.0],
+        "Категория": ["Cafe"],
+    }), full_export=False)
+    frame = dataset.load()
+
+    assert store_for(frame) is store
+    assert np.shares_memory(store.frame["Сумма платежа"].to_numpy(), frame["Сумма платежа"].to_numpy())
+    assert store.frame["Дата платежа"].iloc[-1] == pd.Timestamp(2023, 1, 21)
+    assert len(spending_by_category.__wrapped__.__wrapped__(frame, "Cafe", (31, 1, 2023))) == 1
@@ -0,0 +1,103 @@
+import json
+
+import pandas as pd
+
+from loader import Dataset
+from memo import ResultCache, memoize
+from reports import report_to_file
+
+
+def make_dataset():
+    data = Dataset("operations.xlsx")
+    data.set_frame(pd.DataFrame({
+        "Дата операции": ["15.01.2023 10:00:00", "20.01.2023 12:00:00"],
+        "Дата платежа": ["15.01.2023", "20.01.2023"],
+        "Номер карты": ["*1234", "*1234"],
+        "Сумма платежа": [-1000.0, -500.0],
+        "Категория": ["Food", "Food"],
+        "Описание": ["Shop", "Cafe"],
+    }))
+    return data
+
+
+def test_result_cache_lru_and_size():
+    """Вытесняются давно не использованные записи, лимит - и по числу, и по размеру"""
+    cache = ResultCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+
+    small = ResultCache(max_bytes=1000)
+    small.set("big", list(range(1000)))
+    assert len(small) == 0
+    small.set("x", [1, 2, 3])
+    assert small.get("x") == (True, [1, 2, 3])
+    assert small.size <= 1000
+
+
+def test_memoize_invalidated_by_append():
+    """Повторный вызов берется из кэша, после append считается заново"""
+    calls = []
+
+    @memoize()
+    def total(df, categories):
+        calls.append(categories)
+        return {"total": float(df.loc[df["Категория"].isin(categories), "Сумма платежа"].sum())}
+
+    data = make_dataset()
+    first = total(data.load(), ["Food"])
+    first["total"] = 0  # результат отдается копией
+    assert total(data.load(), ["Food"]) == {"total": -1500.0}
+    assert calls == [["Food"]]
+
+    data.append(pd.DataFrame({
+        "Дата операции": ["21.01.2023 09:00:00"],
+        "Дата платежа": ["21.01.2023"],
+        "Номер карты": ["*1234"],
+        "Сумма платежа": [-100.0],
+        "Категория": ["Food"],
+        "Описание": ["Shop"],
+    }), full_export=False)
+    assert total(data.load(), ["Food"]) == {"total": -1600.0}
+    assert calls == [["Food"], ["Food"]]
+
+
+def test_report_not_rewritten(tmp_path, monkeypatch):
+    """Отчет для тех же данных и аргументов не пишется повторно, пока файл не изменился"""
+    monkeypatch.chdir(tmp_path)
+
+    @report_to_file("food.json")
+    @memoize()
+    def spending(df, category):
+        return df[df["Категория"] == category]
+
+    frame = make_dataset().load()
+    report = tmp_path / "reports" / "food.json"
+    spending(frame, "Food")
+    written = report.stat().st_mtime_ns
+    spending(frame, "Food")
+    assert report.stat().st_mtime_ns == written
+
+    report.write_text("{}", encoding="utf-8")  # файл изменили - отчет пишется заново
+    spending(frame, "Food")
+    assert json.loads(report.read_text(encoding="utf-8"))["total_sum"] == 1500.0
+    print("✅ Повторный отчет не перезаписывается")
+
+
+def test_caller_frame_not_memoized():
+    """Фрейм вызывающего не из Dataset: результат не кэшируется и видит изменения на месте"""
+    calls = []
+
+    @memoize()
+    def total(df):
+        calls.append(len(df))
+        return float(df["Сумма платежа"].sum())
+
+    frame = make_dataset().load().copy()
+    assert total(frame) == -1500.0
+    frame.loc[0, "Сумма платежа"] = -5000.0
+    assert total(frame) == -5500.0
+    assert len(calls) == 2 and len(total.cache) == 0
@@ -0,0 +1,49 @@
+import time
+
+from metrics import Metrics
+
+
+def test_stage_accumulates():
+    """Этап копит вызовы, строки и время"""
+    metrics = Metrics()
+    for _ in range(2):
+        with metrics.stage("all_cards", rows=10) as run:
+            time.sleep(0.01)
+    snapshot = metrics.snapshot()
+
+    assert snapshot["all_cards"]["calls"] == 2
+    assert snapshot["all_cards"]["rows"] == 20
+    assert snapshot["all_cards"]["seconds"] >= 0.02
+    assert run.seconds >= 0.01
+
+
+def test_timed_and_prometheus(tmp_path):
+    """Декоратор считает строки по первому аргументу, дамп в формате Prometheus"""
+    metrics = Metrics()
+
+    @metrics.timed()
+    def count(rows):
+        return len(rows)
+
+    count([1, 2, 3])
+    path = tmp_path / "metrics.prom"
+    metrics.write_prometheus(path)
+    text = path.read_text(encoding="utf-8")
+
+    assert "# TYPE stage_calls_total counter" in text
+    assert 'stage_calls_total{stage="count"} 1' in text
+    assert 'stage_rows_total{stage="count"} 3' in text
+
+
+def test_memory_tracing():
+    """С включенным tracemalloc этап видит прирост памяти"""
+    metrics = Metrics()
+    metrics.trace_memory()
+    try:
+        with metrics.stage("alloc") as run:
+            data = bytearray(1_000_000)
+    finally:
+        metrics.trace_memory(False)
+
+    assert len(data) == 1_000_000
+    assert run.alloc_bytes >= 1_000_000
@@ -0,0 +1,32 @@
+import datetime
+
+import pandas as pd
+
+from query import PAYMENTS, Filter, GroupSum, Query, Top, execute, period
+
+
+def make_operations():
+    return pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.01.2023", "10.02.2023", "11.02.2023", None],
+        "Номер карты": ["*1234", "*5678", "*1234", "*1234", "*5678"],
+        "Сумма платежа": [-1000.0, -500.0, -300.0, 200.0, -50.0],
+        "Категория": ["Food", "Food", "Taxi", "Salary", "Food"],
+        "Описание": ["Shop", "Cafe", "Taxi", "Salary", "Shop"],
+    })
+
+
+def test_group_sums():
+    """Суммы и число строк по группам с условием"""
+    df = make_operations()
+    result = execute(df, Query(GroupSum(("Категория",), ("Сумма платежа",), count=True), (PAYMENTS,)))
+    assert result["Сумма платежа"].to_dict() == {"Food": -1550.0, "Taxi": -300.0}
+    assert result["count"].to_dict() == {"Food": 3, "Taxi": 1}
+
+
+def test_filters_and_top():
+    """Топ с условиями периода и по группам"""
+    df = make_operations()
+    top = execute(df, Query(Top(2), period(end=datetime.datetime(2023, 1, 31))))
+    cards = execute(df, Query(Top(1, "Номер карты"), (Filter("Категория", "isin", ["Food"]),)))
+    assert top["Сумма платежа"].tolist() == [-1000.0, -500.0]
+    assert cards["Номер карты"].tolist() == ["*1234", "*5678"]
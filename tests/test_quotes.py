@@ -0,0 +1,157 @@
+import json
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from quotes import QuoteFetcher, QuoteHistory, TTLCache
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Отвечает как apilayer (/latest) и finnhub (/quote)"""
+
+    delay = 0.0
+    calls: list[str] = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        StubHandler.calls.append(url.path)
+        time.sleep(self.delay)
+        if url.path == "/latest":
+            body = {"rates": {"USD": 0.011, "EUR": 0.01}}
+        elif url.path == "/quote":
+            body = {"c": {"AAPL": 175.5, "TSLA": 250.0}.get(params["symbol"][0], 1.0)}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    StubHandler.calls = []
+    StubHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_all(stub_url):
+    """Курсы и цены собираются в прежнем формате"""
+    fetcher = QuoteFetcher(rates_url=stub_url, stocks_url=stub_url)
+    rates, stocks = fetcher.fetch_all("USD, EUR", ["AAPL", "TSLA"])
+    fetcher.close()
+
+    assert rates == [{"currency": "USD", "rate": 90.91}, {"currency": "EUR", "rate": 100.0}]
+    assert stocks == [{"stock": "AAPL", "price": 175.5}, {"stock": "TSLA", "price": 250.0}]
+
+
+def test_repeated_fetch_uses_cache(stub_url):
+    """Повторный запрос в пределах ttl не ходит в сеть"""
+    fetcher = QuoteFetcher(rates_url=stub_url, stocks_url=stub_url)
+    fetcher.fetch_all("USD", ["AAPL", "TSLA"])
+    calls = len(StubHandler.calls)
+    fetcher.fetch_all("USD", ["AAPL", "TSLA"])
+    fetcher.close()
+
+    assert calls == 3
+    assert len(StubHandler.calls) == calls
+
+
+def test_requests_run_in_parallel(stub_url):
+    """Время ответа - одна задержка, а не сумма задержек"""
+    StubHandler.delay = 0.3
+    fetcher = QuoteFetcher(rates_url=stub_url, stocks_url=stub_url)
+    start = time.perf_counter()
+    fetcher.fetch_all("USD", ["AAPL", "TSLA", "AMZN", "MSFT"])
+    elapsed = time.perf_counter() - start
+    fetcher.close()
+
+    assert elapsed < 0.3 * 3
+
+
+def test_ttl_cache_expires():
+    """Запись кэша пропадает после ttl"""
+    now = [0.0]
+    cache = TTLCache(ttl=60, clock=lambda: now[0])
+    cache.set("key", 1)
+    now[0] = 59
+    assert cache.get("key") == 1
+    now[0] = 60
+    assert cache.get("key") is None
+
+
+def test_history_store(tmp_path):
+    """История хранит все значения, latest - последние по каждому символу"""
+    history = QuoteHistory(tmp_path / "quotes.sqlite3")
+    history.record("rate:RUB", {"USD": 90.0, "EUR": 100.0}, fetched_at=10)
+    history.record("rate:RUB", {"USD": 91.0}, fetched_at=20)
+
+    assert history.latest("rate:RUB", ["USD", "EUR"]) == (10, {"USD": 91.0, "EUR": 100.0})
+    assert history.latest("rate:RUB", ["USD", "CNY"]) is None
+    assert history.history("rate:RUB", "USD") == [(10, 90.0), (20, 91.0)]
+    assert history.history("rate:RUB", "USD", start=15) == [(20, 91.0)]
+    history.close()
+
+
+def test_stale_values_served_from_history(stub_url, tmp_path):
+    """Свежие значения - без сети, устаревшие - сразу из истории с обновлением в фоне"""
+    now = [1000.0]
+    history = QuoteHistory(tmp_path / "quotes.sqlite3")
+    fetcher = QuoteFetcher(
+        rates_url=stub_url, stocks_url=stub_url, ttl=0, history=history,
+        fresh_for=60, stale_for=3600, clock=lambda: now[0],
+    )
+    history.record("stock", {"AAPL": 150.0}, fetched_at=990)
+    assert fetcher.stock_price("AAPL") == {"stock": "AAPL", "price": 150.0}
+    assert StubHandler.calls == []
+
+    now[0] = 2000.0
+    StubHandler.delay = 0.2
+    start = time.perf_counter()
+    assert fetcher.stock_price("AAPL") == {"stock": "AAPL", "price": 150.0}
+    assert time.perf_counter() - start < 0.2
+    for _ in range(50):
+        if history.latest("stock", ["AAPL"])[0] == 2000.0:
+            break
+        time.sleep(0.05)
+    assert history.latest("stock", ["AAPL"]) == (2000.0, {"AAPL": 175.5})
+    fetcher.close()
+
+
+def test_offline_fallback(tmp_path):
+    """Если API недоступен, отдается последнее известное значение"""
+    history = QuoteHistory(tmp_path / "quotes.sqlite3")
+    history.record("rate:RUB", {"USD": 90.0}, fetched_at=0)
+    fetcher = QuoteFetcher(rates_url="http://127.0.0.1:9", stocks_url="http://127.0.0.1:9",
+                           timeout=0.5, history=history, stale_for=0)
+    assert fetcher.currency_rates("USD") == [{"currency": "USD", "rate": 90.0}]
+    with pytest.raises(requests.RequestException):
+        fetcher.stock_price("AAPL")
+    fetcher.close()
+
+
+def test_requests_imported_on_first_fetch(tmp_path):
+    """import views не тянет requests, он подгружается при первом сетевом запросе"""
+    src = Path(__file__).resolve().parent.parent / "src"
+    code = f"import sys; sys.path.insert(0, {str(src)!r}); import views; print('requests' in sys.modules)"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=tmp_path)
+    assert completed.stdout.strip() == "False"
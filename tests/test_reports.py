@@ -2,6 +2,15 @@
 import pandas as pd
 import calendar
 import datetime
+import gzip
+import io
+import json
+
+import pytest
+
+from reports import (ReportTable, ReportWriter, export_report, iter_report_rows, report_to_file, save_report,
+                     spending_by_categories, spending_by_category, write_combined_report, write_json_report,
+                     write_ndjson_report)
 
 
 def test_analize_category_basic():
@@ -158,6 +167,188 @@ def test_month_boundaries():
     print("✅ Границы месяцев")
 
 
+def test_spending_by_category_window():
+    """spending_by_category отдает расходы категории за 90 дней, новые сверху"""
+    df = pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.03.2023", "10.02.2023", "01.12.2022", "01.03.2023"],
+        "Сумма платежа": [-1000, -500, -300, -100, 700],
+        "Категория": ["Food", "Food", "Food", "Food", "Food"]
+    })
+
+    result = spending_by_category.__wrapped__(df, "Food", (31, 3, 2023))
+
+    assert list(result.index) == [1, 2, 0]
+    assert result["Итог"].iloc[0] == "Всего потрачено: 1800.00 руб"
+    assert df["Дата платежа"].iloc[0] == "15.01.2023"
+    print("✅ Траты по категории")
+
+
+def test_spending_by_categories_matches_single_calls():
+    """Пакетный расчет совпадает с отдельными вызовами spending_by_category"""
+    df = pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.03.2023", "10.02.2023", "01.12.2022", "05.03.2023"],
+        "Сумма платежа": [-1000, -500, -300, -100, -700],
+        "Категория": ["Food", "Food", "Taxi", "Food", "Taxi"]
+    })
+    queries = [("Food", (31, 3, 2023)), ("Taxi", (31, 3, 2023)), ("Food", (1, 1, 2023)), ("Cafe", (1, 1, 2023))]
+
+    results = spending_by_categories.__wrapped__(df, queries)
+
+    assert len(results) == len(queries)
+    for (category, date), result in zip(queries, results):
+        pd.testing.assert_frame_equal(result, spending_by_category.__wrapped__(df, category, date))
+
+    combined = io.StringIO()
+    write_combined_report(combined, results)
+    reports = json.loads(combined.getvalue())["reports"]
+    assert [report["total_sum"] for report in reports] == [1500.0, 1000.0, 100.0, 0.0]
+    print("✅ Пакетный расчет")
+
+
+def test_streaming_json_matches_json_dump():
+    """Потоковая запись дает тот же файл, что и json.dump"""
+    df = pd.DataFrame({
+        "Дата платежа": pd.to_datetime(["2023-01-15", "2023-01-20", "2023-02-10"]),
+        "Категория": ["Еда", "Еда", "Транспорт"],
+        "Сумма платежа": [-1000.5, -500.0, -300.25],
+    })
+    expected = {
+        "total_sum": 1800.75,
+        "transactions": [
+            {"Дата платежа": "15.01.2023", "Категория": "Еда", "Сумма платежа": -1000.5},
+            {"Дата платежа": "20.01.2023", "Категория": "Еда", "Сумма платежа": -500.0},
+            {"Дата платежа": "10.02.2023", "Категория": "Транспорт", "Сумма платежа": -300.25},
+        ],
+    }
+
+    pretty = io.StringIO()
+    write_json_report(pretty, 1800.75, iter_report_rows(df, chunk_size=2))
+    assert pretty.getvalue() == json.dumps(expected, ensure_ascii=False, indent=2)
+
+    compact = io.StringIO()
+    write_json_report(compact, 1800.75, iter_report_rows(df, chunk_size=2), compact=True)
+    assert json.loads(compact.getvalue()) == expected
+    assert "\n" not in compact.getvalue()
+
+    lines = io.StringIO()
+    write_ndjson_report(lines, 1800.75, iter_report_rows(df, chunk_size=2))
+    rows = [json.loads(line) for line in lines.getvalue().splitlines()]
+    assert rows[0] == {"total_sum": 1800.75}
+    assert rows[1:] == expected["transactions"]
+    print("✅ Потоковая запись")
+
+
+def test_background_report_writer(tmp_path, monkeypatch):
+    """Фоновый режим возвращает результат сразу, файл появляется после flush"""
+    monkeypatch.chdir(tmp_path)
+    writer = ReportWriter(maxsize=1)
+    monkeypatch.setattr("reports.report_writer", writer)
+
+    @report_to_file(filename="totals.json", background=True)
+    def totals():
+        return {"Food": 15}
+
+    assert totals() == {"Food": 15}
+    writer.flush()
+    with open(tmp_path / "reports" / "totals.json", encoding="utf-8") as f:
+        assert json.load(f) == {"Food": 15}
+    writer.shutdown()
+    print("✅ Фоновая запись")
+
+
+def test_background_writer_logs_errors(tmp_path, monkeypatch, caplog):
+    """Ошибка записи не роняет поток и попадает в лог"""
+    monkeypatch.chdir(tmp_path)
+    writer = ReportWriter()
+    writer.submit({"a": 1}, str(tmp_path / "bad.txt"), fmt="xml")
+    writer.submit({"a": 1}, str(tmp_path / "good.json"))
+    writer.flush()
+    writer.shutdown()
+
+    assert "bad.txt" in caplog.text
+    assert (tmp_path / "good.json").exists()
+
+
+def _report_frame():
+    return pd.DataFrame({
+        "Дата платежа": pd.to_datetime(["2023-01-15", "2023-01-20"]),
+        "Категория": ["Еда", "Еда"],
+        "Сумма платежа": [-1000.5, -500.0],
+    })
+
+
+def test_report_table_matches_frame():
+    """Подготовленная таблица пишется так же, как исходный фрейм"""
+    df = _report_frame()
+    from_frame, from_table = io.StringIO(), io.StringIO()
+    write_json_report(from_frame, 1500.5, iter_report_rows(df))
+    write_json_report(from_table, 1500.5, iter_report_rows(ReportTable(df)))
+    assert from_table.getvalue() == from_frame.getvalue()
+    assert ReportTable(df).total == 1500.5
+    print("✅ Подготовленная таблица")
+
+
+def test_export_several_formats(tmp_path):
+    """Один результат пишется в json, ndjson и csv со сжатием gzip"""
+    df = _report_frame()
+    paths = {fmt: str(tmp_path / f"report.{fmt}.gz") for fmt in ("json", "ndjson", "csv")}
+    export_report(df, paths, compression="gzip")
+
+    with gzip.open(paths["json"], "rt", encoding="utf-8") as f:
+        assert json.load(f)["transactions"][0] == {
+            "Дата платежа": "15.01.2023", "Категория": "Еда", "Сумма платежа": -1000.5
+        }
+    with gzip.open(paths["ndjson"], "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline()) == {"total_sum": 1500.5}
+    with gzip.open(paths["csv"], "rt", encoding="utf-8") as f:
+        csv = pd.read_csv(f)
+    assert csv["Дата платежа"].tolist() == ["15.01.2023", "20.01.2023"]
+    print("✅ Несколько форматов")
+
+
+def test_csv_combined_report(tmp_path):
+    """Несколько отчетов в csv - одна таблица с номером отчета"""
+    df = _report_frame()
+    save_report([df, df.iloc[:1]], str(tmp_path / "combined.csv"), fmt="csv")
+    csv = pd.read_csv(tmp_path / "combined.csv")
+    assert csv["Отчет"].tolist() == [0, 0, 1]
+    with pytest.raises(ValueError):
+        save_report({"a": 1}, str(tmp_path / "bad.csv"), fmt="csv")
+    print("✅ csv для нескольких отчетов")
+
+
+def test_report_to_file_formats(tmp_path, monkeypatch):
+    """Декоратор с кортежем форматов пишет файл на каждый формат"""
+    monkeypatch.chdir(tmp_path)
+
+    @report_to_file(filename="window.json", fmt=("json", "csv"), compression="gzip")
+    def window():
+        return _report_frame()
+
+    window()
+    assert sorted(p.name for p in (tmp_path / "reports").iterdir()) == ["window.csv.gz", "window.json.gz"]
+    print("✅ Форматы декоратора")
+
+
+def test_optional_backends(tmp_path):
+    """parquet и zstd пишутся, если установлены pyarrow и zstandard"""
+    df = _report_frame()
+    with pytest.raises(ValueError):
+        save_report(df, str(tmp_path / "report.json.xz"), compression="xz")
+    try:
+        import zstandard
+    except ImportError:
+        with pytest.raises(ValueError):
+            save_report(df, str(tmp_path / "report.json.zst"), compression="zstd")
+    else:
+        save_report(df, str(tmp_path / "report.json.zst"), compression="zstd")
+        with zstandard.open(tmp_path / "report.json.zst", "rt", encoding="utf-8") as f:
+            assert json.load(f)["total_sum"] == 1500.5
+    pytest.importorskip("pyarrow")
+    save_report(df, str(tmp_path / "report.parquet"), fmt="parquet")
+    assert pd.read_parquet(tmp_path / "report.parquet")["Категория"].tolist() == ["Еда", "Еда"]
+
+
 def run_all_tests():
     """Запуск всех тестов"""
     print("🧪 Запуск тестов analytics...\n")
@@ -0,0 +1,53 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from reports import frame_total, spending_by_category
+from rolling import DailySpend, rolling_spending
+from schema import compact_operations
+
+
+def make_operations():
+    days = pd.date_range("2023-01-01", periods=60, freq="D")
+    return pd.DataFrame({
+        "Дата платежа": np.repeat(days.strftime("%d.%m.%Y"), 2),
+        "Сумма платежа": np.tile([-10.5, 3.0], 60) * np.repeat(np.arange(1, 61), 2),
+        "Категория": np.tile(["Food", "Taxi"], 60),
+        "Номер карты": "*1234",
+    })
+
+
+def test_window_total_matches_spending_by_category():
+    """Сумма за окно совпадает с итогом spending_by_category"""
+    df = make_operations()
+    daily = DailySpend(df)
+    end = datetime.datetime(2023, 2, 20)
+    expected = frame_total(spending_by_category.__wrapped__(df, "Food", (20, 2, 2023)))
+    assert daily.total("Food", end - datetime.timedelta(days=90), end) == expected
+    assert daily.total("Taxi", end - datetime.timedelta(days=90), end) == 0.0
+    assert daily.total("Unknown", end, end) == 0.0
+
+
+def test_rolling_matches_direct_sums():
+    """Скользящие суммы совпадают с прямым расчетом, append дает тот же результат"""
+    df = compact_operations(make_operations())
+    daily = DailySpend(df)
+    rolling = daily.rolling(7)
+    food = make_operations().iloc[::2]["Сумма платежа"].abs().to_numpy()
+    expected = [food[max(0, i - 6):i + 1].sum() for i in range(60)]
+    assert np.allclose(rolling["Food"].to_numpy(), expected)
+    assert rolling.index[0] == pd.Timestamp(2023, 1, 1)
+
+    parts = DailySpend(df.iloc[60:])
+    parts.append(df.iloc[:60])
+    assert parts.rolling(7)["Food"].tolist() == rolling["Food"].tolist()
+
+
+def test_rolling_spending_long_format():
+    """Все окна одним фреймом в длинном формате"""
+    result = rolling_spending(make_operations(), windows=(1, 30))
+    assert list(result.columns) == ["Дата", "Окно", "Категория", "Сумма"]
+    first = result[result["Дата"] == pd.Timestamp(2023, 1, 1)]
+    assert first[["Окно", "Сумма"]].values.tolist() == [[1, 10.5], [30, 10.5]]
+    print("✅ Скользящие траты по всем окнам")
@@ -0,0 +1,73 @@
+import pandas as pd
+
+import schema
+from schema import align_categories, compact_operations, format_dates, parse_dates
+
+
+def make_operations():
+    return pd.DataFrame({
+        "Дата операции": ["15.01.2023 10:00:00", "20.01.2023 12:30:00", None],
+        "Дата платежа": ["15.01.2023", "20.01.2023", None],
+        "Номер карты": ["*1234", "*1234", None],
+        "Сумма платежа": [-1000.0, -500.0, 300.0],
+        "Категория": ["Food", "Food", "Taxi"],
+        "Описание": ["Shop", "Shop", "Taxi"],
+    })
+
+
+def test_compact_operations_dtypes():
+    """Текст - category, даты - datetime64, исходный фрейм не меняется"""
+    df = make_operations()
+    compact = compact_operations(df)
+
+    assert isinstance(compact["Категория"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact["Описание"].dtype, pd.CategoricalDtype)
+    assert compact["Дата платежа"].iloc[1] == pd.Timestamp(2023, 1, 20)
+    assert compact["Дата операции"].iloc[1] == pd.Timestamp(2023, 1, 20, 12, 30)
+    assert pd.isna(compact["Дата платежа"].iloc[2])
+    assert compact["Сумма платежа"].dtype == df["Сумма платежа"].dtype
+    assert df["Дата платежа"].dtype == object
+
+
+def test_parse_dates_bad_values():
+    """Другие форматы разбираются с днем первым, нераспознанные даты становятся NaT"""
+    dates = parse_dates(pd.Series(["01.02.2023", "oops", "01.02.2023", "2023-02-03", "4/2/2023"]), "%d.%m.%Y")
+    assert dates.iloc[0] == dates.iloc[2] == pd.Timestamp(2023, 2, 1)
+    assert pd.isna(dates.iloc[1])
+    assert dates.iloc[3] == pd.Timestamp(2023, 2, 3)
+    assert dates.iloc[4] == pd.Timestamp(2023, 2, 4)
+
+
+def test_date_parts():
+    """Год, месяц и номер дня считаются при загрузке, пустая дата - 0 и -1"""
+    compact = compact_operations(make_operations())
+    assert compact["Год платежа"].tolist() == [2023, 2023, 0]
+    assert compact["Месяц платежа"].tolist() == [1, 1, 0]
+    assert compact["Номер дня платежа"].tolist() == [19372, 19377, -1]
+
+
+def test_format_dates_cached(monkeypatch):
+    """Строки дат берутся из кэша, повторное форматирование не вызывает strftime"""
+    dates = compact_operations(make_operations())["Дата платежа"]
+    first = format_dates(dates)
+    assert first[:2] == ["15.01.2023", "20.01.2023"]
+    assert pd.isna(first[2])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("strftime не должен вызываться повторно")
+
+    monkeypatch.setattr(pd.DatetimeIndex, "strftime", fail)
+    assert format_dates(dates)[:2] == first[:2]
+    assert ("%d.%m.%Y", pd.Timestamp(2023, 1, 15).value) in schema._formatted
+
+
+def test_align_categories_keeps_category_after_concat():
+    """После выравнивания concat не превращает category в object"""
+    frame = compact_operations(make_operations())
+    delta = compact_operations(make_operations().assign(Категория=["Cafe", "Food", "Cafe"]))
+
+    frame, delta = align_categories(frame, delta)
+    merged = pd.concat([frame, delta], ignore_index=True)
+
+    assert isinstance(merged["Категория"].dtype, pd.CategoricalDtype)
+    assert list(merged["Категория"]) == ["Food", "Food", "Taxi", "Cafe", "Food", "Cafe"]
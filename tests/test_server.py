@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+import views
+from loader import Dataset, peek_for_frame
+from server import DashboardApp
+
+
+def make_dataset(cards=("*1234", "*1234", "*5678")):
+    data = Dataset("operations.xlsx", compact=True)
+    data.set_frame(pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.01.2023", "10.02.2023"],
+        "Номер карты": list(cards),
+        "Сумма платежа": [-1000.0, -500.0, -300.0],
+        "Категория": ["Food", "Food", "Taxi"],
+        "Описание": ["Shop", "Shop", "Taxi"],
+        "Бонусы (включая кэшбэк)": [10, 5, 3],
+    }))
+    return data
+
+
+@pytest.fixture
+def app(monkeypatch, fake_quotes):
+    data = make_dataset()
+    # общий dataset views с другими картами: сервер должен отвечать только своими данными
+    monkeypatch.setattr(views, "dataset", make_dataset(("*0000", "*0000", "*0000")))
+    monkeypatch.setattr(views, "currencies_to_request", lambda: "USD")
+    monkeypatch.setattr(views, "stocks_to_request", lambda: [])
+    return DashboardApp(data)
+
+
+async def request(port: int, *targets: str) -> list[tuple[int, dict]]:
+    '''несколько запросов по одному keep-alive соединению'''
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for target in targets:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()).strip():
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        body = await reader.readexactly(int(headers["content-length"]))
+        responses.append((status, json.loads(body)))
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def test_endpoints(app):
+    """Эндпоинты отдают те же данные, что и функции модулей"""
+    async def run():
+        server = await app.serve(port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            responses = await request(
+                port,
+                "/dashboard",
+                "/categories?year=2023&month=1",
+                "/spending?category=Food&date=31.01.2023",
+                "/categories?year=2023&month=13",
+                "/unknown",
+            )
+            await asyncio.sleep(0.05)  # сервер закрывает соединение со своей стороны
+            return responses
+
+    dashboard, categories, spending, bad, missing = asyncio.run(run())
+    assert dashboard[0] == 200
+    assert {card["last_digits"] for card in dashboard[1]["cards"]} == {"*1234", "*5678"}
+    assert dashboard[1]["currency_of_valuets"] == [{"currency": "USD", "rate": 90.91}]
+    assert categories == (200, {"Food": 15})
+    assert spending[0] == 200
+    assert spending[1]["total_sum"] == 1500.0
+    assert len(spending[1]["transactions"]) == 2
+    assert bad[0] == 400
+    assert missing[0] == 404
+    print("✅ Сервер отвечает на все эндпоинты")
+
+
+def test_warm_up_builds_indexes(app):
+    """Прогрев сервера строит индексы всех эндпоинтов, включая индекс категорий"""
+    app.warm_up()
+    operations = app.data.load()
+    for name in ("running_top_5", "category_index", "operations_store"):
+        assert peek_for_frame(operations, name) is not None
+
+
+def test_cache_invalidated_by_version(app):
+    """Ответ берется из кэша, пока не изменится версия данных"""
+    calls = []
+    build = app.categories
+
+    async def run():
+        first = await build({"year": ["2023"], "month": ["1"]})
+        app.data.set_frame(app.data.load())  # та же таблица, но новая версия
+        second = await build({"year": ["2023"], "month": ["1"]})
+        third = await build({"year": ["2023"], "month": ["1"]})
+        return first, second, third
+
+    original = app.cache.get
+
+    async def counting(version, key, ttl, builder):
+        def wrapped():
+            calls.append(key)
+            return builder()
+        return await original(version, key, ttl, wrapped)
+
+    app.cache.get = counting
+    first, second, third = asyncio.run(run())
+    assert first == second == third
+    assert len(calls) == 2
@@ -3,6 +3,8 @@ import pandas as pd
 import calendar
 import datetime
 
+from services import CategoryIndex, analize_category
+
 
 def test_all():
     """Все тесты без mock"""
@@ -43,5 +45,39 @@ def test_all():
     print("\n🎉 100% покрытие логики")
 
 
+def test_analize_category_uses_index():
+    """analize_category считает по индексу и не меняет переданный фрейм"""
+    df = pd.DataFrame({
+        "Дата платежа": ["15.01.2023", "20.01.2023", "10.02.2023", "31.01.2023"],
+        "Сумма платежа": [-1000, -550, -300, 200],
+        "Категория": ["Food", "Food", "Transport", "Food"]
+    })
+    before = df.copy()
+
+    assert analize_category(df, 2023, 1) == {"Food": 15}
+    assert analize_category(df, 2023, 2) == {"Transport": 3}
+    assert analize_category(df, 2023, 3) == {}
+    pd.testing.assert_frame_equal(df, before)
+    print("✅ Индекс по месяцам")
+
+
+def test_category_index_append():
+    """Новые операции дописываются в индекс без пересборки"""
+    index = CategoryIndex(pd.DataFrame({
+        "Дата платежа": ["15.01.2023"],
+        "Сумма платежа": [-1000],
+        "Категория": ["Food"]
+    }))
+    index.append(pd.DataFrame({
+        "Дата платежа": ["16.01.2023", "17.01.2023"],
+        "Сумма платежа": [-500, -700],
+        "Категория": ["Food", "Cafe"]
+    }))
+
+    assert index.month(2023, 1) == {"Cafe": 7, "Food": 15}
+    assert index.spend(2023, 1, "Food") == 1500
+    assert index.spend(2024, 1, "Food") == 0
+
+
 if __name__ == "__main__":
     test_all()
\ No newline at end of file
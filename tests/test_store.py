@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pandas as pd
+
+from store import OperationsStore
+
+
+def make_operations():
+    return pd.DataFrame({
+        "Дата платежа": ["10.03.2023", "01.01.2023", "15.02.2023", "20.02.2023", None, "05.03.2023"],
+        "Сумма платежа": [-100, -200, -300, 400, -500, -600],
+        "Категория": ["Food", "Food", "Food", "Food", "Food", "Taxi"]
+    })
+
+
+def test_window_is_sorted_by_date():
+    """Окно отдает только расходы категории за период, по возрастанию даты"""
+    store = OperationsStore(make_operations())
+
+    positions = store.window("Food", datetime(2023, 1, 1), datetime(2023, 3, 10))
+    assert list(positions) == [1, 2, 0]
+    assert list(store.window("Food", datetime(2023, 2, 1), datetime(2023, 2, 28))) == [2]
+    assert list(store.window("Cafe", datetime(2023, 1, 1), datetime(2023, 12, 31))) == []
+    assert sorted(store.categories) == ["Food", "Taxi"]
+
+
+def test_rows_keep_original_order():
+    """rows возвращает строки в исходном порядке с разобранными датами"""
+    store = OperationsStore(make_operations())
+    rows = store.rows(store.window("Food", datetime(2023, 1, 1), datetime(2023, 3, 10)))
+
+    assert list(rows.index) == [0, 1, 2]
+    assert rows["Дата платежа"].iloc[0] == pd.Timestamp(2023, 3, 10)
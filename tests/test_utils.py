@@ -1,5 +1,10 @@
+import datetime
+
 import pandas as pd
 
+from loader import Dataset, peek_for_frame
+from utils import CardSummary, RunningTop, all_cards, prepare_dashboard, top_transactions
+
 
 def test_all_cards():
     """Тест логики all_cards"""
@@ -97,6 +102,122 @@ def test_edge_cases():
     assert len(top5) == 5
 
 
+def test_card_summary():
+    """Сводка по картам: траты, кэшбэк по категориям и число операций"""
+    df = pd.DataFrame({
+        "Номер карты": ["*1234", "*5678", "*1234", "*5678"],
+        "Сумма платежа": [-100, -200, -50, 30],
+        "Категория": ["Food", "Taxi", "Taxi", "Food"]
+    })
+
+    assert all_cards(df) == [
+        {"last_digits": "*1234", "total_spent": 150.0, "cashback": 1.5},
+        {"last_digits": "*5678", "total_spent": 200.0, "cashback": 2.0},
+    ]
+
+    summary = CardSummary(df, cashback_percent={"Food": 5})
+    summary.append(pd.DataFrame({"Номер карты": ["*9999"], "Сумма платежа": [-1000], "Категория": ["Food"]}))
+    assert summary.records(with_counts=True) == [
+        {"last_digits": "*1234", "total_spent": 150.0, "cashback": 5.5, "operations": 2},
+        {"last_digits": "*5678", "total_spent": 200.0, "cashback": 2.0, "operations": 1},
+        {"last_digits": "*9999", "total_spent": 1000.0, "cashback": 50.0, "operations": 1},
+    ]
+    print("✅ card summary: OK")
+
+
+def test_all_cards_sees_in_place_edits():
+    """Изменение фрейма на месте сразу видно в сводке и топе"""
+    raw = pd.DataFrame({
+        "Дата платежа": ["01.01.2023"],
+        "Номер карты": ["*1234"],
+        "Сумма платежа": [-100.0],
+        "Категория": ["Food"],
+        "Описание": ["Shop"],
+    })
+    assert all_cards(raw)[0]["total_spent"] == 100.0
+    raw.loc[0, "Сумма платежа"] = -900.0
+    assert all_cards(raw)[0]["total_spent"] == 900.0
+    assert top_transactions(raw)[0]["amount"] == 900.0
+    print("✅ Сводка после изменения фрейма")
+
+
+def test_prepare_dashboard_builds_cards_and_top():
+    """Прогрев строит только то, что читает дашборд: сводку по картам и топ"""
+    df = pd.DataFrame({
+        "Дата платежа": ["01.01.2023", "02.01.2023"],
+        "Номер карты": ["*1234", "*5678"],
+        "Сумма платежа": [-100.0, -300.0],
+        "Категория": ["Food", "Taxi"],
+        "Описание": ["Shop", "Taxi"],
+    })
+    expected = (all_cards(df), top_transactions(df))
+    Dataset("operations.xlsx").set_frame(df)
+    prepare_dashboard(df)
+    assert peek_for_frame(df, "running_top_5") is not None
+    assert peek_for_frame(df, "category_index") is None
+    assert (all_cards(df), top_transactions(df)) == expected
+
+
+def test_top_transactions_options():
+    """Топ с настраиваемым n, группировкой и периодом"""
+    df = pd.DataFrame({
+        "Дата платежа": ["01.01.2023", "02.01.2023", "03.02.2023", "04.02.2023"],
+        "Сумма платежа": [-1000, -500, -700, 100],
+        "Номер карты": ["*1", "*2", "*1", "*2"],
+        "Категория": ["Food", "Taxi", "Food", "Food"],
+        "Описание": ["Restaurant", "Taxi", "Shop", "Refund"]
+    })
+
+    assert [i["amount"] for i in top_transactions(df)] == [1000, 700, 500, -100]
+    assert [i["amount"] for i in top_transactions(df, n=2)] == [1000, 700]
+
+    by_card = top_transactions(df, n=1, by="card")
+    assert by_card["*1"][0]["description"] == "Restaurant"
+    assert by_card["*2"][0]["description"] == "Taxi"
+
+    february = top_transactions(df, n=1, start=datetime.datetime(2023, 2, 1), end=datetime.datetime(2023, 2, 28))
+    assert february == [{"date": "03.02.2023", "amount": 700, "category": "Food", "description": "Shop"}]
+    print("✅ top_transactions options: OK")
+
+
+def test_running_top_updates():
+    """RunningTop обновляется новыми операциями без пересортировки"""
+    first = pd.DataFrame({
+        "Дата платежа": ["01.01.2023", "02.01.2023"],
+        "Сумма платежа": [-100, -300],
+        "Категория": ["Food", "Taxi"],
+        "Описание": ["A", "B"]
+    })
+    running = RunningTop(2, first)
+    running.append(pd.DataFrame({
+        "Дата платежа": ["03.01.2023", "04.01.2023"],
+        "Сумма платежа": [-200, -50],
+        "Категория": ["Food", "Food"],
+        "Описание": ["C", "D"]
+    }))
+
+    assert [i["description"] for i in running.top()] == ["B", "C"]
+
+
+def test_top_transactions_duplicate_index_labels():
+    """Топ по фрейму с повторяющимися метками индекса (concat без ignore_index)"""
+    part = pd.DataFrame({
+        "Дата платежа": ["01.01.2023", "02.01.2023"],
+        "Сумма платежа": [-1000, -500],
+        "Номер карты": ["*1", "*2"],
+        "Категория": ["Food", "Taxi"],
+        "Описание": ["Restaurant", "Taxi"]
+    })
+    df = pd.concat([part, part])
+
+    assert [i["amount"] for i in top_transactions(df, n=3)] == [1000, 1000, 500]
+
+    by_card = top_transactions(df, n=1, by="card")
+    assert {card: len(rows) for card, rows in by_card.items()} == {"*1": 1, "*2": 1}
+    assert by_card["*1"][0]["description"] == "Restaurant"
+    print("✅ top_transactions с повторяющимся индексом: OK")
+
+
 if __name__ == "__main__":
 
     test_all_cards()
@@ -1,7 +1,16 @@
 # test_no_import.py
 import json
+import os
+import subprocess
+import sys
+from pathlib import Path
 from unittest.mock import patch, MagicMock
 
+import pandas as pd
+
+import views
+from loader import Dataset
+
 
 def test_veb_json_logic():
     """Тестируем логику без импорта проблемного модуля"""
@@ -40,5 +49,83 @@ def test_veb_json_logic():
     print(f"Результат: {json.dumps(data, indent=2)}")
 
 
+def test_import_has_no_side_effects(tmp_path):
+    """Импорт views не читает данные и не создает папку логов"""
+    src = Path(__file__).resolve().parent.parent / "src"
+    code = "import views, reports, loader; assert not loader.dataset.loaded"
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True,
+                   env={**os.environ, "PYTHONPATH": str(src)})
+    assert not (tmp_path / "logs_output").exists()
+
+
+def test_veb_json_debug_stages(monkeypatch, fake_quotes):
+    """С debug в ответ добавляются замеры по этапам"""
+    data = Dataset("operations.xlsx")
+    data.set_frame(pd.DataFrame({
+        "Дата платежа": ["01.01.2023"],
+        "Номер карты": ["*1234"],
+        "Сумма платежа": [-100.0],
+        "Категория": ["Food"],
+        "Описание": ["Shop"],
+    }))
+    monkeypatch.setattr(views, "dataset", data)
+
+    plain = json.loads(views.veb_json())
+    assert "debug" not in plain
+    assert plain["currency_stoks"] == [{"stock": "AAPL", "price": 175.5}]
+
+    stages = json.loads(views.veb_json(debug=True))["debug"]["stages"]
+    assert list(stages) == [
+        "load", "greetings", "all_cards", "top_transactions", "currency_of_valuets", "currency_stoks"
+    ]
+    assert stages["all_cards"]["rows"] == 1
+
+
+def test_veb_json_sections_cached(monkeypatch, fake_quotes):
+    """Повторный ответ собирается из готовых разделов без расчетов и запросов"""
+    data = Dataset("operations.xlsx")
+    data.set_frame(pd.DataFrame({
+        "Дата платежа": ["01.01.2023", "02.01.2023"],
+        "Номер карты": ["*1234", "*5678"],
+        "Сумма платежа": [-100.0, -250.0],
+        "Категория": ["Food", "Taxi"],
+        "Описание": ["Shop", "Taxi"],
+    }))
+    monkeypatch.setattr(views, "dataset", data)
+    monkeypatch.setattr(views, "dashboard_cache", views.DashboardCache())
+
+    first = views.veb_json()
+    cards = MagicMock(side_effect=AssertionError("all_cards не должен вызываться"))
+    monkeypatch.setattr(views, "all_cards", cards)
+    assert views.veb_json() == first
+    assert fake_quotes.submit_all.call_count == 1
+    assert first == json.dumps(json.loads(first), indent=4)
+
+    data.set_frame(data.load().assign(**{"Сумма платежа": [-100.0, -50.0]}))
+    monkeypatch.setattr(views, "all_cards", lambda operations: [])
+    assert json.loads(views.veb_json())["cards"] == []
+    assert fake_quotes.submit_all.call_count == 1
+
+
+def test_quote_sections_follow_fetcher(monkeypatch, fake_quotes):
+    """Подмена quote_fetcher сбрасывает разделы котировок, даже если старый объект удален"""
+    data = Dataset("operations.xlsx")
+    data.set_frame(pd.DataFrame({
+        "Дата платежа": ["01.01.2023"],
+        "Номер карты": ["*1234"],
+        "Сумма платежа": [-100.0],
+        "Категория": ["Food"],
+        "Описание": ["Shop"],
+    }))
+    monkeypatch.setattr(views, "dashboard_cache", views.DashboardCache())
+    views.veb_json(data=data)
+
+    other = MagicMock()
+    other.submit_all.side_effect = fake_quotes.submit_all.side_effect
+    monkeypatch.setattr(views, "quote_fetcher", other)
+    views.veb_json(data=data)
+    assert other.submit_all.call_count == 1
+
+
 if __name__ == "__main__":
-    test_veb_json_logic()
\ No newline at end of file
+    test_veb_json_logic()